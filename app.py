@@ -9,18 +9,16 @@ This is the main Flask application file that coordinates all the modular systems
 - Modules Management (modules_management.py)
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, session, g
 import sqlite3
-import hashlib
+import itertools
 import os
-import json
-from datetime import datetime, timedelta
+import queue
+import threading
+import time
+from datetime import datetime
 from functools import wraps
-from user_management import create_user_manager
-# from modules_management import create_module_manager  # Disabled - functionality moved to course_manager
-from registration_management import create_registration_manager
-from course_management import create_course_manager
-# from course_modules_management import create_course_modules_manager  # Disabled - functionality moved to course_manager
+from jinja2 import FileSystemBytecodeCache, TemplateError
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -30,18 +28,134 @@ app.secret_key = 'teacher-training-secret-key-2024'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'static', 'uploads')
 
+# Behind a server that supports X-Sendfile (Apache mod_xsendfile, lighttpd), let it send file bodies
+app.use_x_sendfile = os.environ.get('USE_X_SENDFILE', 'False').lower() == 'true'
+
+# Cache compiled templates on disk so restarts skip re-parsing the template source
+JINJA_CACHE_DIR = os.path.join(os.getcwd(), '.jinja_cache')
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
 # Database file
 DATABASE = 'teacher_training_simple.db'
 
+# Stored in PRAGMA user_version; bump whenever init_database gains new DDL
+SCHEMA_VERSION = 12
+
+# Tables whose writes bump their counter in data_versions
+VERSIONED_TABLES = ('users', 'courses', 'lessons', 'enrollments', 'user_progress', 'module_attachments')
+
+# Maximum number of idle connections kept open for reuse
+DB_POOL_SIZE = 10
+
+# Compiled statements cached per connection, keyed by SQL text
+DB_STATEMENT_CACHE_SIZE = 256
+
+# Every this many returns to the pool, a connection runs PRAGMA optimize so
+# planner statistics follow the data as it grows
+DB_OPTIMIZE_INTERVAL = 1000
+
+# Per-connection tuning, applied once when the pool opens a new connection
+CONNECTION_PRAGMAS = (
+    'PRAGMA foreign_keys = ON',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -40000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+)
+
+# Idle connections, most recently used first so their page cache stays warm
+_connection_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_pool_returns = itertools.count(1)
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that returns itself to the pool when closed."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.row_factory = sqlite3.Row
+
+    def close(self):
+        """Release the connection back to the pool, discarding any open transaction."""
+        if getattr(self, '_in_pool', False):
+            return
+        if self.in_transaction:
+            self.rollback()
+        if next(_pool_returns) % DB_OPTIMIZE_INTERVAL == 0:
+            self._optimize()
+        try:
+            self._in_pool = True
+            _connection_pool.put_nowait(self)
+        except queue.Full:
+            self._in_pool = False
+            self._optimize()
+            super().close()
+
+    def _optimize(self):
+        """Let SQLite refresh stale planner statistics; skipped if another writer holds the lock."""
+        try:
+            self.execute('PRAGMA optimize')
+        except sqlite3.OperationalError:
+            pass
+
 def get_db_connection():
-    """Get database connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    """Get database connection (reused from the pool when one is idle)."""
+    try:
+        conn = _connection_pool.get_nowait()
+        conn._in_pool = False
+        return conn
+    except queue.Empty:
+        pass
+
+    # Autocommit mode: reads never open a transaction; multi-statement writes use an explicit BEGIN.
+    # Pooled connections live long, so keep more compiled statements than the default 128.
+    conn = sqlite3.connect(DATABASE, factory=PooledConnection, check_same_thread=False,
+                           isolation_level=None, cached_statements=DB_STATEMENT_CACHE_SIZE)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
+@app.teardown_appcontext
+def close_request_db_connection(exception):
+    """Return the connection the repositories shared during this request (flask.g.db) to the pool."""
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.close()
+
 def init_database():
     """Initialize the database with required tables."""
     conn = get_db_connection()
+
+    # Skip all DDL and seeding once the database is at the current schema version
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+        # Re-analyze only the tables whose statistics have drifted since the last run
+        conn.execute('PRAGMA optimize')
+        conn.close()
+        return
+
+    # Write-ahead logging lets readers proceed while a write is in progress.
+    # The journal mode is stored in the database file, so this persists across runs.
+    conn.execute('PRAGMA journal_mode = WAL')
+    
+    # Foreign key enforcement has to be off while tables are rebuilt below
+    conn.execute('PRAGMA foreign_keys = OFF')
+    
+    # Apply the schema and seed data atomically
+    conn.execute('BEGIN')
+    
+    # Tables created before their foreign keys had ON DELETE actions are moved aside,
+    # recreated from the definitions below, and refilled (SQLite can't alter constraints).
+    # Legacy rename mode keeps other tables' REFERENCES pointing at the original names.
+    rebuilt_tables = []
+    conn.execute('PRAGMA legacy_alter_table = ON')
+    for table in ('users', 'lessons', 'enrollments', 'user_progress'):
+        existing = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if existing and 'ON DELETE' not in existing['sql']:
+            conn.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+            rebuilt_tables.append(table)
+    conn.execute('PRAGMA legacy_alter_table = OFF')
     
     # Create users table with approval system and university-style fields
     conn.execute('''
@@ -87,7 +201,7 @@ def init_database():
             motivation TEXT,
             how_did_you_hear TEXT,
             FOREIGN KEY (approved_by) REFERENCES users (id),
-            FOREIGN KEY (preferred_course_id) REFERENCES courses (id)
+            FOREIGN KEY (preferred_course_id) REFERENCES courses (id) ON DELETE SET NULL
         )
     ''')
     
@@ -120,25 +234,16 @@ def init_database():
             learning_objectives TEXT,
             additional_resources TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (course_id) REFERENCES courses (id)
+            FOREIGN KEY (course_id) REFERENCES courses (id) ON DELETE CASCADE
         )
     ''')
     
     # Check if lessons table needs migration for learning_objectives and additional_resources
-    try:
-        # Try to add the columns if they don't exist
-        conn.execute('ALTER TABLE lessons ADD COLUMN learning_objectives TEXT')
-        print("Added learning_objectives column to lessons table")
-    except sqlite3.OperationalError:
-        # Column already exists
-        pass
-    
-    try:
-        conn.execute('ALTER TABLE lessons ADD COLUMN additional_resources TEXT')
-        print("Added additional_resources column to lessons table")
-    except sqlite3.OperationalError:
-        # Column already exists
-        pass
+    lesson_columns = {row['name'] for row in conn.execute('PRAGMA table_info(lessons)')}
+    for column in ('learning_objectives', 'additional_resources'):
+        if column not in lesson_columns:
+            conn.execute(f'ALTER TABLE lessons ADD COLUMN {column} TEXT')
+            print(f"Added {column} column to lessons table")
     
     # Enrollments table with approval system
     conn.execute('''
@@ -152,13 +257,37 @@ def init_database():
             approval_status TEXT DEFAULT 'pending',
             approved_at TIMESTAMP,
             approved_by INTEGER,
+            user_is_admin INTEGER DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (course_id) REFERENCES courses (id),
+            FOREIGN KEY (course_id) REFERENCES courses (id) ON DELETE CASCADE,
             FOREIGN KEY (approved_by) REFERENCES users (id),
             UNIQUE(user_id, course_id)
         )
     ''')
     
+    # Enrollment statistics exclude admin users; keep that flag on the enrollment itself
+    # so the aggregates don't have to join users
+    enrollment_columns = {row['name'] for row in conn.execute('PRAGMA table_info(enrollments)')}
+    if 'user_is_admin' not in enrollment_columns:
+        conn.execute('ALTER TABLE enrollments ADD COLUMN user_is_admin INTEGER DEFAULT 0')
+        print("Added user_is_admin column to enrollments table")
+    
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_enrollments_user_is_admin
+        AFTER INSERT ON enrollments
+        BEGIN
+            UPDATE enrollments SET user_is_admin = (SELECT role = 'admin' FROM users WHERE id = NEW.user_id)
+            WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_role_enrollments
+        AFTER UPDATE OF role ON users
+        BEGIN
+            UPDATE enrollments SET user_is_admin = (NEW.role = 'admin') WHERE user_id = NEW.id;
+        END
+    ''')
+    
     # User progress table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS user_progress (
@@ -169,11 +298,102 @@ def init_database():
             completed_at TIMESTAMP,
             time_spent INTEGER DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (lesson_id) REFERENCES lessons (id),
+            FOREIGN KEY (lesson_id) REFERENCES lessons (id) ON DELETE CASCADE,
             UNIQUE(user_id, lesson_id)
         )
     ''')
     
+    # Files attached to modules (lessons)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS module_attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            module_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            path TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (module_id) REFERENCES lessons (id) ON DELETE CASCADE
+        )
+    ''')
+    
+    # Copy rows into the rebuilt tables, keeping their AUTOINCREMENT counters
+    # (the insert trigger above sets user_is_admin for copied enrollments)
+    for table in rebuilt_tables:
+        columns = ', '.join(row['name'] for row in conn.execute(f'PRAGMA table_info({table}_old)'))
+        conn.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_old')
+        conn.execute('''
+            UPDATE sqlite_sequence SET seq = (SELECT seq FROM sqlite_sequence WHERE name = ?)
+            WHERE name = ?
+        ''', (f'{table}_old', table))
+        conn.execute(f'DROP TABLE {table}_old')
+        print(f"Rebuilt {table} table with ON DELETE foreign key actions")
+    
+    # Per-table change counters, bumped by triggers on every write, so pages can tell cheaply whether
+    # anything they show has changed (written by any manager or process)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for table in VERSIONED_TABLES:
+        conn.execute('INSERT OR IGNORE INTO data_versions (name) VALUES (?)', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            ''')
+    
+    # Indexes for the dashboard filters on enrollments, users and courses
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_enrollments_user_status ON enrollments (user_id, approval_status, is_active)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_enrollments_status_course ON enrollments (approval_status, course_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_status_role ON users (approval_status, role)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_courses_published ON courses (is_published)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_courses_instructor_created ON courses (instructor_id, created_at DESC)')
+    
+    # Indexes for the course repository's per-course aggregates and lookups
+    # (enrollments by user/course and progress by user/lesson are covered by their UNIQUE constraints)
+    conn.execute('DROP INDEX IF EXISTS idx_enrollments_course')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_enrollments_course_status ON enrollments (course_id, approval_status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_lessons_course_order ON lessons (course_id, lesson_order)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_progress_completed ON user_progress (user_id, lesson_id) WHERE completed = 1')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_enrollments_learner_course_status ON enrollments (course_id, approval_status) WHERE user_is_admin = 0')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_enrollments_pending ON enrollments (enrolled_at DESC) WHERE approval_status = 'pending'")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_module_attachments_module ON module_attachments (module_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_progress_lesson_completed ON user_progress (lesson_id, user_id, time_spent) WHERE completed = 1')
+    
+    # Indexes for the user repository's pending-approval queue and newest-first admin listing
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_approval_created ON users (approval_status, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)')
+    
+    # Backfill the admin flag for enrollments that predate the column
+    conn.execute('''
+        UPDATE enrollments SET user_is_admin = (SELECT role = 'admin' FROM users WHERE users.id = enrollments.user_id)
+        WHERE user_is_admin IS NOT (SELECT role = 'admin' FROM users WHERE users.id = enrollments.user_id)
+    ''')
+    
+    # Attachments used to be appended to the module content as "**Attached File:**" / "**File Path:**" lines
+    for lesson in conn.execute("SELECT id, content FROM lessons WHERE content LIKE '%**File Path:**%'").fetchall():
+        filename = None
+        kept_lines = []
+        for line in lesson['content'].split('\n'):
+            if line.startswith('**Attached File:**'):
+                filename = line[len('**Attached File:**'):].strip()
+            elif line.startswith('**File Path:**'):
+                path = line[len('**File Path:**'):].strip()
+                conn.execute(
+                    'INSERT INTO module_attachments (module_id, filename, path) VALUES (?, ?, ?)',
+                    (lesson['id'], filename or os.path.basename(path), path)
+                )
+                filename = None
+            else:
+                kept_lines.append(line)
+        conn.execute('UPDATE lessons SET content = ? WHERE id = ?', ('\n'.join(kept_lines).rstrip(), lesson['id']))
+        print(f"Moved attachments of module {lesson['id']} into module_attachments")
+    
     # Create default admin user if not exists
     admin_exists = conn.execute(
         'SELECT id FROM users WHERE email = ?', 
@@ -181,82 +401,72 @@ def init_database():
     ).fetchone()
     
     if not admin_exists:
-        password_hash = hashlib.sha256('admin123'.encode()).hexdigest()
+        from user_management import hash_password
+        password_hash = hash_password('admin123')
         conn.execute('''
-            INSERT INTO users (username, email, full_name, password_hash, role, is_active, approval_status, approved_at, approved_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, 1)
+            INSERT INTO users (username, email, full_name, password_hash, role, is_active, approval_status, approved_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
         ''', ('admin', 'admin@teachertraining.com', 'System Administrator', 
               password_hash, 'admin', 1, 'approved'))
-    else:
-        # Ensure existing admin user is always approved
-        conn.execute('''
-            UPDATE users 
-            SET approval_status = 'approved', approved_at = CURRENT_TIMESTAMP, approved_by = 1
-            WHERE email = ? AND role = 'admin'
-        ''', ('admin@teachertraining.com',))
-        
-        # Add main courses
-        main_courses = [
-            ('Leadership Development', 
-             'Comprehensive program designed to develop effective leadership skills for educational professionals. Learn strategic thinking, team management, decision-making, and transformational leadership principles.',
-             'Professional Development', 'intermediate', 40, 1, 1),
-            ('Personal Transformation', 
-             'A journey of self-discovery and personal growth. Develop emotional intelligence, resilience, mindfulness, and personal effectiveness skills essential for professional and personal success.',
-             'Personal Development', 'beginner', 30, 1, 1),
-            ('Finance', 
-             'Master financial literacy, budgeting, investment strategies, and financial planning. Essential skills for personal financial management and understanding organizational finances.',
-             'Financial Literacy', 'intermediate', 35, 1, 1),
-            ('Educational Administration', 
-             'Learn the principles and practices of educational management, policy development, curriculum planning, staff management, and institutional leadership in educational settings.',
-             'Administration', 'advanced', 45, 1, 1)
-        ]
-        
-        # Get or create Leadership Development course for sample lessons
-        leadership_course = None
-        for course_data in main_courses:
-            # Check if course already exists
-            existing = conn.execute(
-                'SELECT id FROM courses WHERE title = ?', 
-                (course_data[0],)
-            ).fetchone()
-            
-            if not existing:
-                cursor = conn.execute('''
-                    INSERT INTO courses (title, description, category, level, duration_hours, instructor_id, is_published)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', course_data)
-                
-                # Store Leadership Development course ID for sample lessons
-                if course_data[0] == 'Leadership Development':
-                    leadership_course = cursor.lastrowid
-            else:
-                # Store existing Leadership Development course ID
-                if course_data[0] == 'Leadership Development':
-                    leadership_course = existing['id']
-        
-        # Add sample lessons for Leadership Development course if it exists
-        if leadership_course:
-            lessons = [
-                ('Welcome to Leadership Development', 'Welcome to our comprehensive leadership development program!', 'text', 15, 1),
-                ('Understanding Leadership Styles', 'Learn about different leadership approaches and when to use them.', 'text', 30, 2),
-                ('Team Management Fundamentals', 'Effective strategies for managing and motivating teams.', 'text', 45, 3),
-                ('Strategic Decision Making', 'Develop skills in strategic thinking and decision-making processes.', 'text', 30, 4)
-            ]
-            
-            for lesson in lessons:
-                # Check if lesson already exists
-                existing_lesson = conn.execute(
-                    'SELECT id FROM lessons WHERE title = ? AND course_id = ?',
-                    (lesson[0], leadership_course)
-                ).fetchone()
-                
-                if not existing_lesson:
-                    conn.execute('''
-                        INSERT INTO lessons (title, content, lesson_type, duration_minutes, lesson_order, course_id)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (*lesson, leadership_course))
     
+    # Ensure the admin user is always approved (self-approved, so the reference always resolves)
+    conn.execute('''
+        UPDATE users 
+        SET approval_status = 'approved', approved_at = CURRENT_TIMESTAMP, approved_by = id
+        WHERE email = ? AND role = 'admin'
+    ''', ('admin@teachertraining.com',))
+    
+    # Add main courses
+    main_courses = [
+        ('Leadership Development', 
+         'Comprehensive program designed to develop effective leadership skills for educational professionals. Learn strategic thinking, team management, decision-making, and transformational leadership principles.',
+         'Professional Development', 'intermediate', 40, 1, 1),
+        ('Personal Transformation', 
+         'A journey of self-discovery and personal growth. Develop emotional intelligence, resilience, mindfulness, and personal effectiveness skills essential for professional and personal success.',
+         'Personal Development', 'beginner', 30, 1, 1),
+        ('Finance', 
+         'Master financial literacy, budgeting, investment strategies, and financial planning. Essential skills for personal financial management and understanding organizational finances.',
+         'Financial Literacy', 'intermediate', 35, 1, 1),
+        ('Educational Administration', 
+         'Learn the principles and practices of educational management, policy development, curriculum planning, staff management, and institutional leadership in educational settings.',
+         'Administration', 'advanced', 45, 1, 1)
+    ]
+    
+    # Insert all main courses in one batch, skipping titles that already exist
+    conn.executemany('''
+        INSERT INTO courses (title, description, category, level, duration_hours, instructor_id, is_published)
+        SELECT ?, ?, ?, ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM courses WHERE title = ?1)
+    ''', main_courses)
+
+    # Get Leadership Development course ID for sample lessons
+    leadership_course = conn.execute(
+        'SELECT id FROM courses WHERE title = ?',
+        ('Leadership Development',)
+    ).fetchone()
+
+    # Add sample lessons for Leadership Development course if it exists
+    if leadership_course:
+        lessons = [
+            ('Welcome to Leadership Development', 'Welcome to our comprehensive leadership development program!', 'text', 15, 1),
+            ('Understanding Leadership Styles', 'Learn about different leadership approaches and when to use them.', 'text', 30, 2),
+            ('Team Management Fundamentals', 'Effective strategies for managing and motivating teams.', 'text', 45, 3),
+            ('Strategic Decision Making', 'Develop skills in strategic thinking and decision-making processes.', 'text', 30, 4)
+        ]
+
+        # Insert all sample lessons in one batch, skipping ones already in the course
+        conn.executemany('''
+            INSERT INTO lessons (title, content, lesson_type, duration_minutes, lesson_order, course_id)
+            SELECT ?, ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM lessons WHERE title = ?1 AND course_id = ?6)
+        ''', [(*lesson, leadership_course['id']) for lesson in lessons])
+
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     conn.commit()
+    conn.execute('PRAGMA foreign_keys = ON')
+    
+    # Refresh planner statistics so the indexes above are picked up
+    conn.execute('ANALYZE')
     conn.close()
 
 # Initialize managers (will be set after database initialization)
@@ -266,6 +476,38 @@ registration_manager = None
 course_manager = None
 course_modules_manager = None
 
+def init_managers():
+    """Import the manager modules and register their routes on the app."""
+    global user_manager, registration_manager, course_manager
+    
+    # Imported here so loading app.py does not pull in every manager module up front
+    from user_management import create_user_manager
+    # from modules_management import create_module_manager  # Disabled - functionality moved to course_manager
+    from registration_management import create_registration_manager
+    from course_management import create_course_manager
+    # from course_modules_management import create_course_modules_manager  # Disabled - functionality moved to course_manager
+    
+    user_manager = create_user_manager(app, get_db_connection)
+    # module_manager = create_module_manager(app, get_db_connection)  # Disabled - functionality moved to course_manager
+    registration_manager = create_registration_manager(app, get_db_connection)
+    course_manager = create_course_manager(app, get_db_connection)
+    # course_modules_manager = create_course_modules_manager(app, get_db_connection)  # Disabled - functionality moved to course_manager
+
+# Admin dashboard aggregates are cached briefly; any POST request invalidates them
+DASHBOARD_STATS_TTL = 20  # seconds
+_stats_cache = {'value': None, 'timestamp': 0.0, 'generation': 0}
+_stats_lock = threading.Lock()
+
+# Public pages are identical for every anonymous visitor, so the rendered HTML is reused briefly
+PUBLIC_PAGE_TTL = 30  # seconds
+_public_pages = {}
+
+# Pre-serialized health check body; only the timestamp changes per request
+_HEALTH_TEMPLATE = '{"status": "healthy", "timestamp": "%s", "version": "1.0.0"}'
+
+# Last formatted health check timestamp, refreshed at most once per second
+_timestamp_cache = [0, '']
+
 def login_required(f):
     """Decorator to require login."""
     @wraps(f)
@@ -291,17 +533,88 @@ def admin_required(f):
 
 def safe_int(value, default=0):
     """Safely convert value to integer."""
+    # Values that are already ints (route converters, defaults) skip the try block
+    if type(value) is int:
+        return value or default
     try:
         return int(value) if value else default
     except (ValueError, TypeError):
         return default
 
+def render_public_page(template_name):
+    """Render a page for anonymous visitors, reusing recently rendered HTML."""
+    # Logged-in users and pending flash messages change the output, so render those normally
+    if 'user_id' in session or '_flashes' in session:
+        return render_template(template_name)
+    
+    now = time.monotonic()
+    cached = _public_pages.get(template_name)
+    if cached is None or now - cached[1] >= PUBLIC_PAGE_TTL:
+        cached = (render_template(template_name), now)
+        _public_pages[template_name] = cached
+    return cached[0]
+
+def _now_iso():
+    """Current local time in ISO format, at one-second resolution."""
+    now = int(time.time())
+    if now != _timestamp_cache[0]:
+        _timestamp_cache[1] = datetime.fromtimestamp(now).isoformat()
+        _timestamp_cache[0] = now
+    return _timestamp_cache[1]
+
+def get_dashboard_stats():
+    """Get admin dashboard aggregates, cached for DASHBOARD_STATS_TTL seconds."""
+    with _stats_lock:
+        if _stats_cache['value'] is not None and time.monotonic() - _stats_cache['timestamp'] < DASHBOARD_STATS_TTL:
+            return _stats_cache['value']
+        generation = _stats_cache['generation']
+    
+    conn = get_db_connection()
+    
+    # Get all dashboard card counts in a single round-trip (excludes admin users)
+    counts = conn.execute('''
+        SELECT COUNT(CASE WHEN u.approval_status = 'pending' AND u.role != 'admin' THEN 1 END) as pending_users,
+               COUNT(CASE WHEN u.role != 'admin' THEN 1 END) as total_users,
+               (SELECT COUNT(*) FROM courses) as total_courses,
+               (SELECT COUNT(*) FROM courses WHERE is_published = 1) as published_courses,
+               (SELECT COUNT(*) FROM enrollments WHERE user_is_admin = 0) as total_enrollments,
+               (SELECT COUNT(*) FROM enrollments
+                WHERE approval_status = 'pending' AND user_is_admin = 0) as pending_enrollments
+        FROM users u
+    ''').fetchone()
+    
+    conn.close()
+    
+    stats = dict(counts)
+    stats['user_stats'] = user_manager.get_user_statistics()
+    stats['course_stats'] = course_manager.get_course_statistics() if course_manager else {}
+    
+    with _stats_lock:
+        # Don't store a result computed while a write invalidated the cache
+        if _stats_cache['generation'] == generation:
+            _stats_cache['value'] = stats
+            _stats_cache['timestamp'] = time.monotonic()
+    return stats
+
+def invalidate_stats():
+    """Drop the cached admin dashboard aggregates."""
+    with _stats_lock:
+        _stats_cache['value'] = None
+        _stats_cache['generation'] += 1
+
+@app.after_request
+def invalidate_stats_after_write(response):
+    """Invalidate cached dashboard aggregates after any state-changing request."""
+    if request.method == 'POST':
+        invalidate_stats()
+    return response
+
 @app.route('/')
 def index():
     """Home page."""
     if 'user_id' in session:
         return redirect(url_for('dashboard'))
-    return render_template('index_simple.html')
+    return render_public_page('index_simple.html')
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -324,7 +637,7 @@ def login():
         else:
             flash(message, 'error' if 'Invalid' in message else 'warning')
     
-    return render_template('login_simple.html')
+    return render_public_page('login_simple.html')
 
 # Public signup route (simple). Detailed registration is done after login at /complete-registration
 @app.route('/register', methods=['GET', 'POST'])
@@ -366,11 +679,7 @@ def logout():
 @app.route('/health')
 def health_check():
     """Health check endpoint for monitoring."""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
-    })
+    return Response(_HEALTH_TEMPLATE % _now_iso(), mimetype='application/json')
 
 @app.route('/dashboard')
 @login_required
@@ -378,97 +687,86 @@ def dashboard():
     """User dashboard."""
     if session.get('role') == 'admin':
         # Admin dashboard with system statistics
-        user_stats = user_manager.get_user_statistics()
-        course_stats = course_manager.get_course_statistics() if course_manager else {}
+        stats = get_dashboard_stats()
         
         conn = get_db_connection()
         
-        # Get created courses
+        # Get created courses (enrollments are only counted for the 10 courses shown)
         created_courses = conn.execute('''
-            SELECT c.*, COUNT(e.id) as enrollment_count
+            SELECT c.*,
+                   (SELECT COUNT(*) FROM enrollments e WHERE e.course_id = c.id) as enrollment_count
             FROM courses c
-            LEFT JOIN enrollments e ON c.id = e.course_id
             WHERE c.instructor_id = ?
-            GROUP BY c.id
             ORDER BY c.created_at DESC
             LIMIT 10
         ''', (session['user_id'],)).fetchall()
         
-        # Get pending users count
-        pending_users_count = conn.execute('''
-            SELECT COUNT(*) as count FROM users 
-            WHERE approval_status = 'pending' AND role != 'admin'
-        ''').fetchone()['count']
-        
-        # Get pending enrollments count (excludes admin users)
-        pending_enrollments_count = conn.execute('''
-            SELECT COUNT(*) as count FROM enrollments e
-            JOIN users u ON e.user_id = u.id
-            WHERE e.approval_status = 'pending' AND u.role != 'admin'
-        ''').fetchone()['count']
-        
-        # Get total statistics for dashboard cards (excludes admin users)
-        total_users = conn.execute('SELECT COUNT(*) as count FROM users WHERE role != "admin"').fetchone()['count']
-        total_courses = conn.execute('SELECT COUNT(*) as count FROM courses').fetchone()['count']
-        total_enrollments = conn.execute('''
-            SELECT COUNT(*) as count FROM enrollments e
-            JOIN users u ON e.user_id = u.id
-            WHERE u.role != 'admin'
-        ''').fetchone()['count']
-        published_courses = conn.execute('SELECT COUNT(*) as count FROM courses WHERE is_published = 1').fetchone()['count']
-        
         conn.close()
-        
+
         return render_template('admin_dashboard_simple.html',
                              created_courses=created_courses,
-                             user_stats=user_stats,
-                             course_stats=course_stats,
-                             pending_users=pending_users_count,
-                             pending_enrollments=pending_enrollments_count,
-                             total_users=total_users,
-                             total_courses=total_courses,
-                             total_enrollments=total_enrollments,
-                             published_courses=published_courses)
+                             user_stats=stats['user_stats'],
+                             course_stats=stats['course_stats'],
+                             pending_users=stats['pending_users'],
+                             pending_enrollments=stats['pending_enrollments'],
+                             total_users=stats['total_users'],
+                             total_courses=stats['total_courses'],
+                             total_enrollments=stats['total_enrollments'],
+                             published_courses=stats['published_courses'])
     else:
         # Regular user dashboard - show approved enrollments only
         conn = get_db_connection()
         
-        enrollments = conn.execute('''
-            SELECT e.*, c.title, c.description, c.category, c.level
-            FROM enrollments e
-            JOIN courses c ON e.course_id = c.id
-            WHERE e.user_id = ? AND e.is_active = 1 AND e.approval_status = 'approved'
-            ORDER BY e.enrolled_at DESC
+        # Approved enrollments, pending requests and available courses in one
+        # round-trip; each row is tagged with the list it belongs to
+        dashboard_rows = conn.execute('''
+            SELECT * FROM (
+                SELECT 'enrolled' AS src, e.id, e.course_id, e.approval_status, e.enrolled_at, e.completed_at,
+                       c.title, c.description, c.category, c.level
+                FROM enrollments e
+                JOIN courses c ON e.course_id = c.id
+                WHERE e.user_id = ?1 AND e.is_active = 1 AND e.approval_status = 'approved'
+                ORDER BY e.enrolled_at DESC
+                LIMIT 20
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'pending', e.id, e.course_id, e.approval_status, e.enrolled_at, e.completed_at,
+                       c.title, c.description, c.category, c.level
+                FROM enrollments e
+                JOIN courses c ON e.course_id = c.id
+                WHERE e.user_id = ?1 AND e.approval_status = 'pending'
+                ORDER BY e.enrolled_at DESC
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'available', c.id, c.id, NULL, NULL, NULL,
+                       c.title, c.description, c.category, c.level
+                FROM courses c
+                LEFT JOIN enrollments e ON e.course_id = c.id AND e.user_id = ?1
+                    AND e.is_active = 1 AND e.approval_status = 'approved'
+                WHERE c.is_published = 1 AND e.id IS NULL
+                LIMIT 6
+            )
         ''', (session['user_id'],)).fetchall()
         
-        # Get pending enrollment requests
-        pending_requests = conn.execute('''
-            SELECT e.*, c.title, c.description, c.category, c.level
-            FROM enrollments e
-            JOIN courses c ON e.course_id = c.id
-            WHERE e.user_id = ? AND e.approval_status = 'pending'
-            ORDER BY e.enrolled_at DESC
-        ''', (session['user_id'],)).fetchall()
+        enrollments, pending_requests, available_courses = [], [], []
+        dashboard_lists = {'enrolled': enrollments, 'pending': pending_requests, 'available': available_courses}
+        for row in dashboard_rows:
+            dashboard_lists[row['src']].append(row)
         
-        # Get available courses (not enrolled)
-        enrolled_course_ids = [str(e['course_id']) for e in enrollments]
-        if enrolled_course_ids:
-            placeholders = ','.join(['?' for _ in enrolled_course_ids])
-            available_courses = conn.execute(f'''
-                SELECT * FROM courses 
-                WHERE is_published = 1 AND id NOT IN ({placeholders})
-                LIMIT 6
-            ''', enrolled_course_ids).fetchall()
-        else:
-            available_courses = conn.execute('''
-                SELECT * FROM courses WHERE is_published = 1 LIMIT 6
-            ''').fetchall()
+        # Count approved enrollments in SQL so the list above can stay limited
+        enrollment_counts = conn.execute('''
+            SELECT COUNT(*) AS total, COALESCE(SUM(completed_at IS NOT NULL), 0) AS completed
+            FROM enrollments
+            WHERE user_id = ? AND is_active = 1 AND approval_status = 'approved'
+        ''', (session['user_id'],)).fetchone()
         
         conn.close()
         
         # Calculate statistics
-        total_courses = len(enrollments)
-        completed_courses = len([e for e in enrollments if e['completed_at']])
+        total_courses = enrollment_counts['total']
+        completed_courses = enrollment_counts['completed']
         in_progress_courses = total_courses - completed_courses
         
         return render_template('dashboard_simple.html',
@@ -491,11 +789,14 @@ if __name__ == '__main__':
     init_database()
     
     # Initialize all managers
-    user_manager = create_user_manager(app, get_db_connection)
-    # module_manager = create_module_manager(app, get_db_connection)  # Disabled - functionality moved to course_manager
-    registration_manager = create_registration_manager(app, get_db_connection)
-    course_manager = create_course_manager(app, get_db_connection)
-    # course_modules_manager = create_course_modules_manager(app, get_db_connection)  # Disabled - functionality moved to course_manager
+    init_managers()
+    
+    # Compile every template up front so first page loads don't pay for it
+    for template_name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(template_name)
+        except TemplateError as e:
+            print(f"Skipping template {template_name}: {e}")
     
     # Production settings
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,39 @@
+"""
+Base Repository for Teacher Training System
+
+Shared by the course, module, registration and user repositories:
+- One pooled connection per request, kept on flask.g
+- BEGIN IMMEDIATE write transactions
+"""
+
+from contextlib import contextmanager
+from flask import g, has_app_context
+
+
+class BaseRepository:
+    """Base class for repositories that share the request's database connection."""
+    
+    def __init__(self, db_connection_func):
+        """Initialize with database connection function."""
+        self.get_db_connection = db_connection_func
+    
+    def _conn(self):
+        """Get the connection shared by every repository call in the current request."""
+        # app.py returns it to the pool in its teardown_appcontext handler
+        if not has_app_context():
+            return self.get_db_connection()
+        if 'db' not in g:
+            g.db = self.get_db_connection()
+        return g.db
+    
+    @contextmanager
+    def _tx(self, conn):
+        """Run the block in a BEGIN IMMEDIATE transaction, committing on success and rolling back on error."""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
@@ -10,152 +10,313 @@ This module handles all aspects of course management including:
 """
 
 import sqlite3
+import hashlib
+import json
 import os
-from datetime import datetime
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itsdangerous import BadSignature, Signer
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-from flask import render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory
+from flask import Request, Response, abort, make_response, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory
+from base_repository import BaseRepository
 
 
-class CourseRepository:
+def login_required_json(f):
+    """Decorator for AJAX endpoints: answer 401 JSON instead of flashing and redirecting."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'message': 'Not logged in'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# Seconds that course categories and statistics are served from memory, and how many entries are kept
+COURSE_CACHE_TTL = 30
+COURSE_CACHE_SIZE = 1024
+
+# Signed download links expire on this grid (seconds), so a page rendered twice in a window links the same URL
+SIGNED_URL_WINDOW = 300
+
+# Pending enrollment requests shown per page
+PENDING_PAGE_SIZE = 50
+
+# Retries (and the first backoff delay in seconds) for writes that hit a locked database
+DB_WRITE_RETRIES = 5
+DB_WRITE_RETRY_DELAY = 0.2
+
+# Module files live under here, one folder per course
+UPLOAD_FOLDER = os.path.join(os.getcwd(), 'static', 'uploads')
+UPLOAD_ROOT = os.path.join(UPLOAD_FOLDER, 'courses')
+
+# Incoming file parts are spooled here, outside static/ so partial uploads are never served,
+# but beside it on the same filesystem as UPLOAD_ROOT so they can be linked into place
+UPLOAD_SPOOL_DIR = os.path.join(os.getcwd(), 'upload_spool')
+
+# Uploads smaller than this stay in memory, as in werkzeug's default stream factory
+UPLOAD_SPOOL_THRESHOLD = 500 * 1024
+
+# Bytes read per chunk when hashing and writing an upload to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# When set (e.g. '/_protected/uploads'), downloads are handed to an Nginx internal location via X-Accel-Redirect
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '').rstrip('/')
+
+
+# Upload directories already created by this process
+_created_upload_dirs = set()
+
+
+def _ensure_upload_dir(path):
+    """Create an upload directory once per process instead of on every upload."""
+    if path not in _created_upload_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_upload_dirs.add(path)
+
+
+class UploadRequest(Request):
+    """Request that spools large multipart file parts straight into the uploads tree."""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is None or total_content_length > UPLOAD_SPOOL_THRESHOLD:
+            _ensure_upload_dir(UPLOAD_SPOOL_DIR)
+            return tempfile.NamedTemporaryFile('wb+', dir=UPLOAD_SPOOL_DIR)
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+# Course listing queries, kept as fixed strings so each stays in the statement cache
+_SQL_ALL_COURSES = '''
+    SELECT c.*, u.full_name as instructor_name
+    FROM courses c
+    LEFT JOIN users u ON c.instructor_id = u.id
+    ORDER BY c.created_at DESC
+'''
+
+_SQL_PUBLISHED_COURSES = '''
+    SELECT c.*, u.full_name as instructor_name
+    FROM courses c
+    LEFT JOIN users u ON c.instructor_id = u.id
+    WHERE c.is_published = 1
+    ORDER BY c.created_at DESC
+'''
+
+
+class CourseRepository(BaseRepository):
     """Repository class for handling course-related database operations."""
     
     def __init__(self, db_connection_func):
         """Initialize with database connection function."""
-        self.get_db_connection = db_connection_func
+        super().__init__(db_connection_func)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Bumped by every invalidation, so a read that raced a write doesn't store the value it saw
+        self._cache_generation = 0
+    
+    def _cached(self, key, loader):
+        """Return the cached value for key, reloading it once older than COURSE_CACHE_TTL (least recently used evicted first)."""
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[0] < COURSE_CACHE_TTL:
+                self._cache.move_to_end(key)
+                return entry[1]
+            generation = self._cache_generation
+        
+        value = loader()
+        # Missing rows aren't cached, so lookups of nonexistent ids can't fill the cache
+        if value is not None:
+            with self._cache_lock:
+                # Skip storing if a write was invalidated while loader() ran; the value may predate it
+                if self._cache_generation == generation:
+                    self._cache[key] = (now, value)
+                    self._cache.move_to_end(key)
+                    if len(self._cache) > COURSE_CACHE_SIZE:
+                        self._cache.popitem(last=False)
+        return value
+    
+    def _invalidate_caches(self):
+        """Drop every cached course, module, category, statistic and user enrollment after a change."""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._cache.clear()
+    
+    def _execute_with_retry(self, fn, max_retries=DB_WRITE_RETRIES, initial_delay=DB_WRITE_RETRY_DELAY):
+        """Call fn, retrying with exponential backoff while SQLite reports the database locked or busy."""
+        delay = initial_delay
+        for attempt in range(max_retries + 1):
+            try:
+                return fn()
+            except sqlite3.OperationalError as e:
+                message = str(e)
+                if attempt == max_retries or ('locked' not in message and 'busy' not in message):
+                    raise
+                time.sleep(delay)
+                delay *= 2
     
     def get_all_courses(self, include_unpublished=False):
         """Get all courses with enrollment statistics."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
-        where_clause = "" if include_unpublished else "WHERE c.is_published = 1"
+        # Aggregate enrollments and lessons separately instead of joining both
+        # onto courses, which multiplies enrollment rows by lesson rows
+        enrollments_by_course = {}
+        for row in conn.execute('''
+            SELECT course_id, approval_status, COUNT(*) as count
+            FROM enrollments
+            WHERE user_is_admin = 0
+            GROUP BY course_id, approval_status
+        '''):
+            counts = enrollments_by_course.setdefault(row['course_id'], {'total': 0})
+            counts['total'] += row['count']
+            counts[row['approval_status']] = row['count']
         
-        courses = conn.execute(f'''
-            SELECT c.*, 
-                   COUNT(DISTINCT CASE WHEN eu.role != 'admin' THEN e.id END) as enrollment_count,
-                   COUNT(DISTINCT CASE WHEN e.approval_status = 'approved' AND eu.role != 'admin' THEN e.id END) as approved_enrollments,
-                   COUNT(DISTINCT CASE WHEN e.approval_status = 'pending' AND eu.role != 'admin' THEN e.id END) as pending_enrollments,
-                   COUNT(DISTINCT l.id) as lesson_count,
-                   u.full_name as instructor_name
-            FROM courses c
-            LEFT JOIN enrollments e ON c.id = e.course_id
-            LEFT JOIN users eu ON e.user_id = eu.id
-            LEFT JOIN lessons l ON c.id = l.course_id
-            LEFT JOIN users u ON c.instructor_id = u.id
-            {where_clause}
-            GROUP BY c.id
-            ORDER BY c.created_at DESC
-        ''').fetchall()
+        lesson_counts = dict(conn.execute(
+            'SELECT course_id, COUNT(*) FROM lessons GROUP BY course_id'
+        ).fetchall())
+        
+        # Iterate the cursor directly so only the merged dicts are held in memory
+        courses = conn.execute(_SQL_ALL_COURSES if include_unpublished else _SQL_PUBLISHED_COURSES)
+        
+        course_list = []
+        for course in courses:
+            course = dict(course)
+            counts = enrollments_by_course.get(course['id'], {})
+            course['enrollment_count'] = counts.get('total', 0)
+            course['approved_enrollments'] = counts.get('approved', 0)
+            course['pending_enrollments'] = counts.get('pending', 0)
+            course['lesson_count'] = lesson_counts.get(course['id'], 0)
+            course_list.append(course)
         
-        conn.close()
-        return [dict(course) for course in courses]
+        return course_list
     
     def get_course_by_id(self, course_id):
         """Get a specific course by ID with detailed information."""
-        conn = self.get_db_connection()
+        return self._cached(('course', course_id), lambda: self._load_course(course_id))
+    
+    def _load_course(self, course_id):
+        """Query a course with its enrollment and lesson counts."""
+        conn = self._conn()
         
+        # Scalar subqueries count each table on its own index instead of
+        # de-duplicating an enrollments x lessons join with COUNT(DISTINCT)
         course = conn.execute('''
             SELECT c.*, 
-                   COUNT(DISTINCT CASE WHEN eu.role != 'admin' THEN e.id END) as enrollment_count,
-                   COUNT(DISTINCT CASE WHEN e.approval_status = 'approved' AND eu.role != 'admin' THEN e.id END) as approved_enrollments,
-                   COUNT(DISTINCT l.id) as lesson_count,
+                   (SELECT COUNT(*) FROM enrollments e
+                    WHERE e.course_id = c.id AND e.user_is_admin = 0) as enrollment_count,
+                   (SELECT COUNT(*) FROM enrollments e
+                    WHERE e.course_id = c.id AND e.approval_status = 'approved' AND e.user_is_admin = 0) as approved_enrollments,
+                   (SELECT COUNT(*) FROM lessons l WHERE l.course_id = c.id) as lesson_count,
                    u.full_name as instructor_name
             FROM courses c
-            LEFT JOIN enrollments e ON c.id = e.course_id
-            LEFT JOIN users eu ON e.user_id = eu.id
-            LEFT JOIN lessons l ON c.id = l.course_id
             LEFT JOIN users u ON c.instructor_id = u.id
             WHERE c.id = ?
-            GROUP BY c.id
         ''', (course_id,)).fetchone()
         
-        conn.close()
-        return dict(course) if course else None
+        return course
+    
+    def get_course_detail(self, course_id, user_id=None):
+        """Get a course with the user's enrollment (if any) and its lessons."""
+        course = self.get_course_by_id(course_id)
+        if not course:
+            return None, None, []
+        
+        conn = self._conn()
+        
+        enrollment = None
+        if user_id is not None:
+            enrollment = self.get_user_enrollments(user_id).get(course_id)
+        
+        lessons = conn.execute(
+            'SELECT * FROM lessons WHERE course_id = ? ORDER BY lesson_order',
+            (course_id,)
+        ).fetchall()
+        
+        return course, enrollment, lessons
     
     def create_course(self, course_data):
         """Create a new course."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            cursor = conn.execute('''
-                INSERT INTO courses (
-                    title, description, category, level, duration_hours, 
-                    instructor_id, is_published, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (
-                course_data['title'], course_data['description'], 
-                course_data['category'], course_data['level'],
-                course_data['duration_hours'], course_data['instructor_id'],
-                course_data.get('is_published', 0)
-            ))
+            with self._tx(conn):
+                cursor = conn.execute('''
+                    INSERT INTO courses (
+                        title, description, category, level, duration_hours, 
+                        instructor_id, is_published, created_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (
+                    course_data['title'], course_data['description'], 
+                    course_data['category'], course_data['level'],
+                    course_data['duration_hours'], course_data['instructor_id'],
+                    course_data.get('is_published', 0)
+                ))
             
             course_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
             return True, f'Course "{course_data["title"]}" created successfully.', course_id
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to create course: {str(e)}', None
     
     def update_course(self, course_id, course_data):
         """Update an existing course."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            conn.execute('''
-                UPDATE courses 
-                SET title = ?, description = ?, category = ?, level = ?, 
-                    duration_hours = ?, is_published = ?
-                WHERE id = ?
-            ''', (
-                course_data['title'], course_data['description'],
-                course_data['category'], course_data['level'],
-                course_data['duration_hours'], course_data.get('is_published', 0),
-                course_id
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self._tx(conn):
+                conn.execute('''
+                    UPDATE courses 
+                    SET title = ?, description = ?, category = ?, level = ?, 
+                        duration_hours = ?, is_published = ?
+                    WHERE id = ?
+                ''', (
+                    course_data['title'], course_data['description'],
+                    course_data['category'], course_data['level'],
+                    course_data['duration_hours'], course_data.get('is_published', 0),
+                    course_id
+                ))
+            
+            self._invalidate_caches()
             
             return True, f'Course updated successfully.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to update course: {str(e)}'
     
     def delete_course(self, course_id):
         """Delete a course and all related data."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            # Get course title for confirmation
-            course = conn.execute('SELECT title FROM courses WHERE id = ?', (course_id,)).fetchone()
-            if not course:
-                conn.close()
-                return False, 'Course not found.'
-            
-            # Delete related data in correct order
-            conn.execute('DELETE FROM user_progress WHERE lesson_id IN (SELECT id FROM lessons WHERE course_id = ?)', (course_id,))
-            conn.execute('DELETE FROM lessons WHERE course_id = ?', (course_id,))
-            conn.execute('DELETE FROM enrollments WHERE course_id = ?', (course_id,))
-            conn.execute('DELETE FROM courses WHERE id = ?', (course_id,))
+            with self._tx(conn):
+                # Get course title for confirmation
+                course = conn.execute('SELECT title FROM courses WHERE id = ?', (course_id,)).fetchone()
+                if not course:
+                    return False, 'Course not found.'
+                
+                # Lessons, their progress and enrollments go with it via ON DELETE CASCADE
+                conn.execute('DELETE FROM courses WHERE id = ?', (course_id,))
             
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
             return True, f'Course "{course["title"]}" and all related data deleted successfully.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to delete course: {str(e)}'
     
     def get_course_categories(self):
         """Get all unique course categories."""
-        conn = self.get_db_connection()
+        return self._cached('categories', self._load_course_categories)
+    
+    def _load_course_categories(self):
+        """Query the unique course categories."""
+        conn = self._conn()
         
         categories = conn.execute('''
             SELECT DISTINCT category 
@@ -164,34 +325,35 @@ class CourseRepository:
             ORDER BY category
         ''').fetchall()
         
-        conn.close()
         return [cat['category'] for cat in categories]
     
     def get_course_statistics(self):
         """Get comprehensive course statistics (excludes admin users from enrollment stats)."""
-        conn = self.get_db_connection()
-        
-        stats = {
-            'total_courses': conn.execute('SELECT COUNT(*) as count FROM courses').fetchone()['count'],
-            'published_courses': conn.execute('SELECT COUNT(*) as count FROM courses WHERE is_published = 1').fetchone()['count'],
-            'draft_courses': conn.execute('SELECT COUNT(*) as count FROM courses WHERE is_published = 0').fetchone()['count'],
-            'total_enrollments': conn.execute('''
-                SELECT COUNT(*) as count FROM enrollments e
-                JOIN users u ON e.user_id = u.id
-                WHERE u.role != 'admin'
-            ''').fetchone()['count'],
-            'approved_enrollments': conn.execute('''
-                SELECT COUNT(*) as count FROM enrollments e
-                JOIN users u ON e.user_id = u.id
-                WHERE e.approval_status = "approved" AND u.role != 'admin'
-            ''').fetchone()['count'],
-            'pending_enrollments': conn.execute('''
-                SELECT COUNT(*) as count FROM enrollments e
-                JOIN users u ON e.user_id = u.id
-                WHERE e.approval_status = "pending" AND u.role != 'admin'
-            ''').fetchone()['count'],
-            'total_lessons': conn.execute('SELECT COUNT(*) as count FROM lessons').fetchone()['count'],
-        }
+        return self._cached('statistics', self._load_course_statistics)
+    
+    def _load_course_statistics(self):
+        """Query the course statistics."""
+        conn = self._conn()
+        
+        # Course and lesson totals in one pass over courses
+        stats = dict(conn.execute('''
+            SELECT COUNT(*) as total_courses,
+                   COALESCE(SUM(is_published = 1), 0) as published_courses,
+                   COALESCE(SUM(is_published = 0), 0) as draft_courses,
+                   (SELECT COUNT(*) FROM lessons) as total_lessons
+            FROM courses
+        ''').fetchone())
+        
+        # Enrollment counts per approval status in one grouped query
+        status_counts = dict(conn.execute('''
+            SELECT approval_status, COUNT(*) as count FROM enrollments
+            WHERE user_is_admin = 0
+            GROUP BY approval_status
+        ''').fetchall())
+        
+        stats['total_enrollments'] = sum(status_counts.values())
+        stats['approved_enrollments'] = status_counts.get('approved', 0)
+        stats['pending_enrollments'] = status_counts.get('pending', 0)
         
         # Get category breakdown
         categories = conn.execute('''
@@ -202,7 +364,7 @@ class CourseRepository:
             ORDER BY count DESC
         ''').fetchall()
         
-        stats['categories'] = [dict(cat) for cat in categories]
+        stats['categories'] = categories
         
         # Get level breakdown
         levels = conn.execute('''
@@ -219,105 +381,156 @@ class CourseRepository:
                 END
         ''').fetchall()
         
-        stats['levels'] = [dict(level) for level in levels]
+        stats['levels'] = levels
         
-        conn.close()
         return stats
     
     def get_course_enrollments(self, course_id):
         """Get all enrollments for a specific course (excludes admin users)."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
+        total_lessons = conn.execute(
+            'SELECT COUNT(*) FROM lessons WHERE course_id = ?', (course_id,)
+        ).fetchone()[0]
+        
+        # Iterate the cursor directly so only the merged dicts are held in memory
         enrollments = conn.execute('''
-            SELECT e.*, u.full_name, u.email, u.phone, u.department,
-                   COUNT(up.id) as completed_lessons,
-                   (SELECT COUNT(*) FROM lessons WHERE course_id = ?) as total_lessons
+            SELECT e.*, u.full_name, u.email, u.phone_number as phone, u.department,
+                   u.full_name as student_name, u.email as student_email, u.created_at as user_created,
+                   COALESCE(p.completed_lessons, 0) as completed_lessons
             FROM enrollments e
             JOIN users u ON e.user_id = u.id
-            LEFT JOIN user_progress up ON u.id = up.user_id 
-                AND up.lesson_id IN (SELECT id FROM lessons WHERE course_id = ?)
-                AND up.completed = 1
-            WHERE e.course_id = ? AND u.role != 'admin'
-            GROUP BY e.id, u.id
+            LEFT JOIN (
+                SELECT up.user_id, COUNT(*) as completed_lessons
+                FROM user_progress up
+                JOIN lessons l ON up.lesson_id = l.id
+                WHERE l.course_id = ?1 AND up.completed = 1
+                GROUP BY up.user_id
+            ) p ON p.user_id = e.user_id
+            WHERE e.course_id = ?1 AND u.role != 'admin'
             ORDER BY e.enrolled_at DESC
-        ''', (course_id, course_id, course_id)).fetchall()
+        ''', (course_id,))
+        
+        enrollment_list = []
+        for enrollment in enrollments:
+            enrollment = dict(enrollment)
+            enrollment['total_lessons'] = total_lessons
+            enrollment['progress_percentage'] = (
+                enrollment['completed_lessons'] * 100.0 / total_lessons if total_lessons else 0.0
+            )
+            enrollment_list.append(enrollment)
         
-        conn.close()
-        return [dict(enrollment) for enrollment in enrollments]
+        return enrollment_list
     
     def approve_enrollment(self, enrollment_id, approved_by):
         """Approve a course enrollment."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            # Get enrollment details
-            enrollment = conn.execute('''
-                SELECT e.*, u.full_name, c.title 
-                FROM enrollments e
-                JOIN users u ON e.user_id = u.id
-                JOIN courses c ON e.course_id = c.id
-                WHERE e.id = ?
-            ''', (enrollment_id,)).fetchone()
-            
-            if not enrollment:
-                conn.close()
-                return False, 'Enrollment not found.'
-            
-            # Update enrollment status
-            conn.execute('''
-                UPDATE enrollments 
-                SET approval_status = 'approved', approved_at = CURRENT_TIMESTAMP, approved_by = ?
-                WHERE id = ?
-            ''', (approved_by, enrollment_id))
-            
-            conn.commit()
-            conn.close()
+            with self._tx(conn):
+                # Get enrollment details
+                enrollment = conn.execute('''
+                    SELECT e.*, u.full_name, c.title 
+                    FROM enrollments e
+                    JOIN users u ON e.user_id = u.id
+                    JOIN courses c ON e.course_id = c.id
+                    WHERE e.id = ?
+                ''', (enrollment_id,)).fetchone()
+                
+                if not enrollment:
+                    return False, 'Enrollment not found.'
+                
+                # Update enrollment status
+                conn.execute('''
+                    UPDATE enrollments 
+                    SET approval_status = 'approved', approved_at = CURRENT_TIMESTAMP, approved_by = ?
+                    WHERE id = ?
+                ''', (approved_by, enrollment_id))
+            
+            self._invalidate_caches()
             
             return True, f'Enrollment approved for {enrollment["full_name"]} in "{enrollment["title"]}".'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to approve enrollment: {str(e)}'
     
     def reject_enrollment(self, enrollment_id, rejected_by):
         """Reject a course enrollment."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            # Get enrollment details
-            enrollment = conn.execute('''
-                SELECT e.*, u.full_name, c.title 
-                FROM enrollments e
-                JOIN users u ON e.user_id = u.id
-                JOIN courses c ON e.course_id = c.id
-                WHERE e.id = ?
-            ''', (enrollment_id,)).fetchone()
-            
-            if not enrollment:
-                conn.close()
-                return False, 'Enrollment not found.'
-            
-            # Update enrollment status
-            conn.execute('''
-                UPDATE enrollments 
-                SET approval_status = 'rejected', approved_at = CURRENT_TIMESTAMP, approved_by = ?
-                WHERE id = ?
-            ''', (rejected_by, enrollment_id))
-            
-            conn.commit()
-            conn.close()
+            with self._tx(conn):
+                # Get enrollment details
+                enrollment = conn.execute('''
+                    SELECT e.*, u.full_name, c.title 
+                    FROM enrollments e
+                    JOIN users u ON e.user_id = u.id
+                    JOIN courses c ON e.course_id = c.id
+                    WHERE e.id = ?
+                ''', (enrollment_id,)).fetchone()
+                
+                if not enrollment:
+                    return False, 'Enrollment not found.'
+                
+                # Update enrollment status
+                conn.execute('''
+                    UPDATE enrollments 
+                    SET approval_status = 'rejected', approved_at = CURRENT_TIMESTAMP, approved_by = ?
+                    WHERE id = ?
+                ''', (rejected_by, enrollment_id))
+            
+            self._invalidate_caches()
             
             return True, f'Enrollment rejected for {enrollment["full_name"]} in "{enrollment["title"]}".'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to reject enrollment: {str(e)}'
     
+    def set_enrollments_status(self, enrollment_ids, status, admin_id):
+        """Approve or reject several pending enrollments with one UPDATE; returns (success, message, count)."""
+        if not enrollment_ids:
+            return True, 'No enrollments selected.', 0
+        
+        conn = self._conn()
+        
+        # The ids travel as one JSON array, so the SQL text (and its cached prepared statement) is the same for any selection
+        def update():
+            with self._tx(conn):
+                return conn.execute('''
+                    UPDATE enrollments 
+                    SET approval_status = ?, approved_at = CURRENT_TIMESTAMP, approved_by = ?
+                    WHERE id IN (SELECT value FROM json_each(?)) AND approval_status = 'pending'
+                ''', (status, admin_id, json.dumps(list(enrollment_ids))))
+        
+        try:
+            cursor = self._execute_with_retry(update)
+            
+            self._invalidate_caches()
+            
+            return True, f'{cursor.rowcount} enrollment(s) {status}.', cursor.rowcount
+            
+        except Exception as e:
+            return False, f'Failed to update enrollments: {str(e)}', 0
+    
+    def approve_enrollments(self, enrollment_ids, approved_by):
+        """Approve several course enrollments at once."""
+        return self.set_enrollments_status(enrollment_ids, 'approved', approved_by)
+    
+    def reject_enrollments(self, enrollment_ids, rejected_by):
+        """Reject several course enrollments at once."""
+        return self.set_enrollments_status(enrollment_ids, 'rejected', rejected_by)
+    
+    def get_data_versions(self, tables):
+        """Get the trigger-maintained change counters for the given tables."""
+        conn = self._conn()
+        return conn.execute(
+            'SELECT name, version FROM data_versions WHERE name IN (SELECT value FROM json_each(?)) ORDER BY name',
+            (json.dumps(list(tables)),)
+        ).fetchall()
+    
     def get_course_modules(self, course_id):
         """Get all modules for a specific course."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         modules = conn.execute('''
             SELECT * FROM lessons 
@@ -325,12 +538,44 @@ class CourseRepository:
             ORDER BY lesson_order ASC
         ''', (course_id,)).fetchall()
         
-        conn.close()
         return [dict(module) for module in modules]
     
+    def get_course_modules_with_progress(self, user_id, course_id):
+        """Get a course's modules, each with the user's progress row (or None) under 'progress'."""
+        conn = self._conn()
+        
+        rows = conn.execute('''
+            SELECT l.*, up.id as progress_id, up.completed as progress_completed,
+                   up.completed_at as progress_completed_at, up.time_spent as progress_time_spent
+            FROM lessons l
+            LEFT JOIN user_progress up ON up.lesson_id = l.id AND up.user_id = ?
+            WHERE l.course_id = ?
+            ORDER BY l.lesson_order ASC
+        ''', (user_id, course_id))
+        
+        modules = []
+        for row in rows:
+            module = dict(row)
+            progress_id = module.pop('progress_id')
+            progress = {
+                'completed': module.pop('progress_completed'),
+                'completed_at': module.pop('progress_completed_at'),
+                'time_spent': module.pop('progress_time_spent'),
+            }
+            if progress_id is not None:
+                progress.update(id=progress_id, user_id=user_id, lesson_id=module['id'])
+            module['progress'] = progress if progress_id is not None else None
+            modules.append(module)
+        
+        return modules
+    
     def get_module_by_id(self, module_id):
         """Get a specific module by ID."""
-        conn = self.get_db_connection()
+        return self._cached(('module', module_id), lambda: self._load_module(module_id))
+    
+    def _load_module(self, module_id):
+        """Query a module with its course title."""
+        conn = self._conn()
         
         module = conn.execute('''
             SELECT l.*, c.title as course_title, c.id as course_id
@@ -339,186 +584,191 @@ class CourseRepository:
             WHERE l.id = ?
         ''', (module_id,)).fetchone()
         
-        conn.close()
-        return dict(module) if module else None
+        return module
     
     def create_module(self, module_data):
         """Create a new course module."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            # Get the next order number
-            max_order = conn.execute(
-                'SELECT MAX(lesson_order) as max_order FROM lessons WHERE course_id = ?',
-                (module_data['course_id'],)
-            ).fetchone()
-            
-            next_order = (max_order['max_order'] or 0) + 1
-            
-            cursor = conn.execute('''
-                INSERT INTO lessons (
-                    title, content, lesson_type, duration_minutes, lesson_order, 
-                    course_id, learning_objectives, additional_resources, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (
-                module_data['title'], module_data['content'], 
-                module_data['lesson_type'], module_data['duration_minutes'],
-                next_order, module_data['course_id'],
-                module_data.get('learning_objectives', ''),
-                module_data.get('additional_resources', '')
-            ))
+            # The write lock is taken up front so two admins can't claim the same order number
+            with self._tx(conn):
+                # Get the next order number
+                max_order = conn.execute(
+                    'SELECT MAX(lesson_order) as max_order FROM lessons WHERE course_id = ?',
+                    (module_data['course_id'],)
+                ).fetchone()
+                
+                next_order = (max_order['max_order'] or 0) + 1
+                
+                cursor = conn.execute('''
+                    INSERT INTO lessons (
+                        title, content, lesson_type, duration_minutes, lesson_order, 
+                        course_id, learning_objectives, additional_resources, created_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (
+                    module_data['title'], module_data['content'], 
+                    module_data['lesson_type'], module_data['duration_minutes'],
+                    next_order, module_data['course_id'],
+                    module_data.get('learning_objectives', ''),
+                    module_data.get('additional_resources', '')
+                ))
             
             module_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
             return True, f'Module "{module_data["title"]}" created successfully.', module_id
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to create module: {str(e)}', None
     
     def update_module(self, module_id, module_data):
         """Update an existing module."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            conn.execute('''
-                UPDATE lessons 
-                SET title = ?, content = ?, lesson_type = ?, duration_minutes = ?,
-                    learning_objectives = ?, additional_resources = ?
-                WHERE id = ?
-            ''', (
-                module_data['title'], module_data['content'],
-                module_data['lesson_type'], module_data['duration_minutes'],
-                module_data.get('learning_objectives', ''),
-                module_data.get('additional_resources', ''),
-                module_id
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self._tx(conn):
+                conn.execute('''
+                    UPDATE lessons 
+                    SET title = ?, content = ?, lesson_type = ?, duration_minutes = ?,
+                        learning_objectives = ?, additional_resources = ?
+                    WHERE id = ?
+                ''', (
+                    module_data['title'], module_data['content'],
+                    module_data['lesson_type'], module_data['duration_minutes'],
+                    module_data.get('learning_objectives', ''),
+                    module_data.get('additional_resources', ''),
+                    module_id
+                ))
+            
+            self._invalidate_caches()
             
             return True, 'Module updated successfully.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to update module: {str(e)}'
     
+    def get_module_attachments(self, module_id):
+        """Get the files attached to a module."""
+        return self._cached(('attachments', module_id), lambda: self._conn().execute(
+            'SELECT id, filename, path FROM module_attachments WHERE module_id = ? ORDER BY id',
+            (module_id,)
+        ).fetchall())
+    
+    def add_attachment(self, module_id, uploaded_file):
+        """Record an uploaded file against a module."""
+        conn = self._conn()
+        
+        try:
+            with self._tx(conn):
+                conn.execute(
+                    'INSERT INTO module_attachments (module_id, filename, path) VALUES (?, ?, ?)',
+                    (module_id, uploaded_file['filename'], uploaded_file['path'])
+                )
+            
+            self._invalidate_caches()
+            
+            return True, f'File "{uploaded_file["filename"]}" attached.'
+            
+        except Exception as e:
+            return False, f'Failed to attach file: {str(e)}'
+    
     def delete_module(self, module_id):
         """Delete a module and related progress data."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            # Get module title for confirmation
-            module = conn.execute('SELECT title FROM lessons WHERE id = ?', (module_id,)).fetchone()
-            if not module:
-                conn.close()
-                return False, 'Module not found.'
-            
-            # Delete related progress data
-            conn.execute('DELETE FROM user_progress WHERE lesson_id = ?', (module_id,))
-            conn.execute('DELETE FROM lessons WHERE id = ?', (module_id,))
+            with self._tx(conn):
+                # Get module title for confirmation
+                module = conn.execute('SELECT title FROM lessons WHERE id = ?', (module_id,)).fetchone()
+                if not module:
+                    return False, 'Module not found.'
+                
+                # Delete related progress data
+                conn.execute('DELETE FROM user_progress WHERE lesson_id = ?', (module_id,))
+                conn.execute('DELETE FROM lessons WHERE id = ?', (module_id,))
             
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
             return True, f'Module "{module["title"]}" deleted successfully.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to delete module: {str(e)}'
     
     def reorder_modules(self, course_id, module_orders):
         """Reorder modules in a course."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            for module_id, order in module_orders.items():
-                conn.execute(
+            # One statement and one transaction for the whole new ordering
+            with self._tx(conn):
+                conn.executemany(
                     'UPDATE lessons SET lesson_order = ? WHERE id = ? AND course_id = ?',
-                    (order, module_id, course_id)
+                    [(order, module_id, course_id) for module_id, order in module_orders.items()]
                 )
             
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
             return True, 'Modules reordered successfully.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to reorder modules: {str(e)}'
     
+    def get_user_enrollments(self, user_id):
+        """Map course_id to the user's enrollment row, cached until an enrollment changes."""
+        conn = self._conn()
+        # Keyed on the trigger-maintained counter, so writes from any module (registration, user admin) show up at once
+        version = conn.execute("SELECT version FROM data_versions WHERE name = 'enrollments'").fetchone()[0]
+        return self._cached(('enrollments', user_id, version), lambda: {
+            row['course_id']: row
+            for row in conn.execute('SELECT * FROM enrollments WHERE user_id = ?', (user_id,))
+        })
+    
     def check_user_enrollment(self, user_id, course_id):
         """Check if user is enrolled and approved for a course."""
-        conn = self.get_db_connection()
-        
-        enrollment = conn.execute('''
-            SELECT * FROM enrollments 
-            WHERE user_id = ? AND course_id = ? AND approval_status = 'approved'
-        ''', (user_id, course_id)).fetchone()
-        
-        conn.close()
-        return dict(enrollment) if enrollment else None
+        enrollment = self.get_user_enrollments(user_id).get(course_id)
+        if enrollment and enrollment['approval_status'] == 'approved':
+            return enrollment
+        return None
     
     def get_user_module_progress(self, user_id, module_id):
         """Get user's progress for a specific module."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         progress = conn.execute('''
             SELECT * FROM user_progress 
             WHERE user_id = ? AND lesson_id = ?
         ''', (user_id, module_id)).fetchone()
         
-        conn.close()
-        return dict(progress) if progress else None
+        return progress
     
-    def mark_module_complete(self, user_id, module_id, time_spent=0):
-        """Mark a module as completed for a user (excludes admin users)."""
-        conn = self.get_db_connection()
+    def mark_module_complete_if_enrolled(self, user_id, module_id, time_spent=0):
+        """Mark a module as completed for a user with an approved (non-admin) enrollment in its course."""
+        conn = self._conn()
         
         try:
-            # Check if user is admin - admins don't get progress tracking
-            user_role = conn.execute(
-                'SELECT role FROM users WHERE id = ?', (user_id,)
-            ).fetchone()
-            
-            if user_role and user_role['role'] == 'admin':
-                conn.close()
-                return True, 'Admin access - progress not tracked.'
-            
-            # Check if progress record exists
-            existing = conn.execute(
-                'SELECT id FROM user_progress WHERE user_id = ? AND lesson_id = ?',
-                (user_id, module_id)
-            ).fetchone()
-            
-            if existing:
-                # Update existing record
-                conn.execute('''
-                    UPDATE user_progress 
-                    SET completed = 1, completed_at = CURRENT_TIMESTAMP, time_spent = ?
-                    WHERE user_id = ? AND lesson_id = ?
-                ''', (time_spent, user_id, module_id))
-            else:
-                # Create new progress record
-                conn.execute('''
-                    INSERT INTO user_progress (user_id, lesson_id, completed, completed_at, time_spent)
-                    VALUES (?, ?, 1, CURRENT_TIMESTAMP, ?)
-                ''', (user_id, module_id, time_spent))
+            # The enrollment check and the progress upsert are one statement
+            cursor = conn.execute('''
+                INSERT INTO user_progress (user_id, lesson_id, completed, completed_at, time_spent)
+                SELECT ?1, ?2, 1, CURRENT_TIMESTAMP, ?3
+                WHERE EXISTS (
+                    SELECT 1 FROM lessons l
+                    JOIN enrollments e ON e.course_id = l.course_id
+                    WHERE l.id = ?2 AND e.user_id = ?1
+                      AND e.approval_status = 'approved' AND e.user_is_admin = 0
+                )
+                ON CONFLICT (user_id, lesson_id) DO UPDATE
+                SET completed = 1, completed_at = CURRENT_TIMESTAMP, time_spent = excluded.time_spent
+            ''', (user_id, module_id, time_spent))
             
-            conn.commit()
-            conn.close()
+            if cursor.rowcount == 0:
+                if not self.get_module_by_id(module_id):
+                    return False, 'Module not found'
+                return False, 'Access denied'
             
             return True, 'Module marked as completed.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to mark module as completed: {str(e)}'
 
 
@@ -528,7 +778,11 @@ class CourseManager:
     def __init__(self, app, db_connection_func):
         """Initialize with Flask app and database connection function."""
         self.app = app
+        self.app.request_class = UploadRequest
+        self.app.add_template_filter(self._signed_upload_url, 'signed_upload_url')
         self.course_repo = CourseRepository(db_connection_func)
+        # Part of every page ETag, so a restart (e.g. with new templates) never answers 304 for old HTML
+        self._etag_seed = os.urandom(8).hex()
         self._register_routes()
     
     def _register_routes(self):
@@ -543,29 +797,11 @@ class CourseManager:
         @self.app.route('/course/<int:course_id>')
         def course_detail(course_id):
             """Course detail page."""
-            course = self.course_repo.get_course_by_id(course_id)
+            course, enrollment, lessons = self.course_repo.get_course_detail(course_id, session.get('user_id'))
             if not course:
                 flash('Course not found.', 'error')
                 return redirect(url_for('courses'))
             
-            # Check if user is enrolled
-            enrollment = None
-            if 'user_id' in session:
-                conn = self.course_repo.get_db_connection()
-                enrollment = conn.execute(
-                    'SELECT * FROM enrollments WHERE user_id = ? AND course_id = ?',
-                    (session['user_id'], course_id)
-                ).fetchone()
-                conn.close()
-            
-            # Get course lessons
-            conn = self.course_repo.get_db_connection()
-            lessons = conn.execute(
-                'SELECT * FROM lessons WHERE course_id = ? ORDER BY lesson_order',
-                (course_id,)
-            ).fetchall()
-            conn.close()
-            
             return render_template('course_detail_simple.html', 
                                  course=course, enrollment=enrollment, lessons=lessons)
         
@@ -701,36 +937,54 @@ class CourseManager:
             if not self._check_admin_access():
                 return redirect(url_for('login'))
             
-            conn = self.course_repo.get_db_connection()
-            
-            # Get all enrollments with course and user details (excludes admin users)
-            enrollments = conn.execute('''
-                SELECT e.*, u.full_name, u.email, u.phone, u.department,
-                       c.title as course_title, c.category, c.level,
-                       COUNT(up.id) as completed_lessons,
-                       (SELECT COUNT(*) FROM lessons WHERE course_id = e.course_id) as total_lessons
-                FROM enrollments e
-                JOIN users u ON e.user_id = u.id
-                JOIN courses c ON e.course_id = c.id
-                LEFT JOIN user_progress up ON u.id = up.user_id 
-                    AND up.lesson_id IN (SELECT id FROM lessons WHERE course_id = e.course_id)
-                    AND up.completed = 1
-                WHERE u.role != 'admin'
-                GROUP BY e.id, u.id, c.id
-                ORDER BY e.enrolled_at DESC
-            ''').fetchall()
-            
-            conn.close()
-            
-            # Separate enrollments by status
-            pending_enrollments = [dict(e) for e in enrollments if e['approval_status'] == 'pending']
-            approved_enrollments = [dict(e) for e in enrollments if e['approval_status'] == 'approved']
-            rejected_enrollments = [dict(e) for e in enrollments if e['approval_status'] == 'rejected']
-            
-            return render_template('admin_enrollments.html', 
-                                 pending_enrollments=pending_enrollments,
-                                 approved_enrollments=approved_enrollments,
-                                 rejected_enrollments=rejected_enrollments)
+            def load_context():
+                conn = self.course_repo._conn()
+                
+                # Lesson totals and completed lessons are counted once for all enrollments
+                lesson_counts = dict(conn.execute(
+                    'SELECT course_id, COUNT(*) FROM lessons GROUP BY course_id'
+                ).fetchall())
+                
+                completed_counts = {
+                    (row['user_id'], row['course_id']): row['completed']
+                    for row in conn.execute('''
+                        SELECT up.user_id, l.course_id, COUNT(*) as completed
+                        FROM user_progress up
+                        JOIN lessons l ON up.lesson_id = l.id
+                        WHERE up.completed = 1
+                        GROUP BY up.user_id, l.course_id
+                    ''')
+                }
+                
+                def _fetch_enrollments(status):
+                    """Get enrollments in one approval status with course, user and progress details."""
+                    rows = conn.execute('''
+                        SELECT e.id, e.user_id, e.course_id, e.enrolled_at, e.approved_at,
+                               u.full_name, u.email, u.department,
+                               c.title as course_title, c.category, c.level
+                        FROM enrollments e
+                        JOIN users u ON e.user_id = u.id
+                        JOIN courses c ON e.course_id = c.id
+                        WHERE e.approval_status = ? AND e.user_is_admin = 0
+                        ORDER BY e.enrolled_at DESC
+                    ''', (status,))
+                    
+                    enrollments = []
+                    for row in rows:
+                        enrollment = dict(row)
+                        enrollment['total_lessons'] = lesson_counts.get(enrollment['course_id'], 0)
+                        enrollment['completed_lessons'] = completed_counts.get((enrollment['user_id'], enrollment['course_id']), 0)
+                        enrollments.append(enrollment)
+                    return enrollments
+                
+                # Get enrollments per status (excludes admin users)
+                return {'pending_enrollments': _fetch_enrollments('pending'),
+                        'approved_enrollments': _fetch_enrollments('approved'),
+                        'rejected_enrollments': _fetch_enrollments('rejected')}
+            
+            return self._render_with_etag(
+                ('enrollments', 'users', 'courses', 'lessons', 'user_progress'), 'admin_enrollments.html', load_context
+            )
         
         @self.app.route('/admin/enrollments/pending')
         def pending_enrollments():
@@ -738,22 +992,41 @@ class CourseManager:
             if not self._check_admin_access():
                 return redirect(url_for('login'))
             
-            conn = self.course_repo.get_db_connection()
-            
-            # Get pending enrollments with course and user details (excludes admin users)
-            pending = conn.execute('''
-                SELECT e.*, u.full_name as student_name, u.email as student_email, u.phone, u.department,
-                       c.title as course_title, c.category, c.level, c.duration_hours
-                FROM enrollments e
-                JOIN users u ON e.user_id = u.id
-                JOIN courses c ON e.course_id = c.id
-                WHERE e.approval_status = 'pending' AND u.role != 'admin'
-                ORDER BY e.enrolled_at DESC
-            ''').fetchall()
-            
-            conn.close()
+            def load_context():
+                conn = self.course_repo._conn()
+                
+                # Keyset pagination: each page continues after the (enrolled_at, id) of the previous page's last row
+                before = request.args.get('before')
+                before_id = self._safe_int(request.args.get('before_id'))
+                
+                # Get pending enrollments with the course and user columns the page shows (excludes admin users)
+                pending = conn.execute('''
+                    SELECT e.id, e.course_id, e.enrolled_at,
+                           u.full_name as student_name, u.email as student_email, u.department,
+                           c.title as course_title, c.category
+                    FROM enrollments e
+                    JOIN users u ON e.user_id = u.id
+                    JOIN courses c ON e.course_id = c.id
+                    WHERE e.approval_status = 'pending' AND e.user_is_admin = 0
+                      AND (?1 IS NULL OR (e.enrolled_at, e.id) < (?1, ?2))
+                    ORDER BY e.enrolled_at DESC, e.id DESC
+                    LIMIT ?3
+                ''', (before, before_id, PENDING_PAGE_SIZE + 1)).fetchall()
+                
+                next_page = None
+                if len(pending) > PENDING_PAGE_SIZE:
+                    pending = pending[:PENDING_PAGE_SIZE]
+                    next_page = {'before': pending[-1]['enrolled_at'], 'before_id': pending[-1]['id']}
+                
+                summary = conn.execute('''
+                    SELECT COUNT(*) as total, MIN(enrolled_at) as oldest FROM enrollments
+                    WHERE approval_status = 'pending' AND user_is_admin = 0
+                ''').fetchone()
+                
+                return {'pending': pending, 'next_page': next_page,
+                        'pending_total': summary['total'], 'oldest_pending': summary['oldest']}
             
-            return render_template('pending_enrollments.html', pending=pending)
+            return self._render_with_etag(('enrollments', 'users', 'courses'), 'pending_enrollments.html', load_context)
         
         @self.app.route('/admin/enrollments/bulk-approve', methods=['POST'])
         def bulk_approve_enrollments():
@@ -761,28 +1034,39 @@ class CourseManager:
             if not self._check_admin_access():
                 return redirect(url_for('login'))
             
-            enrollment_ids = request.form.getlist('enrollment_ids')
-            if not enrollment_ids:
-                flash('No enrollments selected for approval.', 'warning')
+            return bulk_update_enrollments('approve')
+        
+        @self.app.route('/admin/enrollments/bulk/<action>', methods=['POST'])
+        def bulk_update_enrollments(action):
+            """Approve or reject every selected enrollment in one transaction."""
+            if not self._check_admin_access():
+                return redirect(url_for('login'))
+            
+            if action not in ('approve', 'reject'):
+                flash('Invalid bulk action.', 'error')
                 return redirect(url_for('pending_enrollments'))
             
-            approved_count = 0
-            failed_count = 0
+            enrollment_ids = tuple({
+                enrollment_id for enrollment_id in
+                (self._safe_int(value) for value in request.form.getlist('enrollment_ids'))
+                if enrollment_id > 0
+            })
+            if not enrollment_ids:
+                flash(f'No enrollments selected to {action}.', 'warning')
+                return redirect(url_for('pending_enrollments'))
             
-            for enrollment_id in enrollment_ids:
-                try:
-                    success, message = self.course_repo.approve_enrollment(int(enrollment_id), session['user_id'])
-                    if success:
-                        approved_count += 1
-                    else:
-                        failed_count += 1
-                except Exception as e:
-                    failed_count += 1
+            if action == 'approve':
+                success, message, count = self.course_repo.approve_enrollments(enrollment_ids, session['user_id'])
+            else:
+                success, message, count = self.course_repo.reject_enrollments(enrollment_ids, session['user_id'])
             
-            if approved_count > 0:
-                flash(f'Successfully approved {approved_count} enrollment(s).', 'success')
-            if failed_count > 0:
-                flash(f'Failed to approve {failed_count} enrollment(s).', 'error')
+            if not success:
+                flash(message, 'error')
+            else:
+                flash(f'Successfully {action}d {count} enrollment(s).', 'success')
+                failed_count = len(enrollment_ids) - count
+                if failed_count > 0:
+                    flash(f'Failed to {action} {failed_count} enrollment(s).', 'error')
             
             return redirect(url_for('pending_enrollments'))
         
@@ -798,7 +1082,7 @@ class CourseManager:
                 flash('Admin users have direct access to all course content and do not need to enroll.', 'info')
                 return redirect(url_for('course_detail', course_id=course_id))
             
-            conn = self.course_repo.get_db_connection()
+            conn = self.course_repo._conn()
             
             # Check if already enrolled
             existing = conn.execute(
@@ -813,24 +1097,24 @@ class CourseManager:
                     flash('You are already enrolled in this course.', 'info')
                 else:
                     flash('Your previous enrollment was rejected. Please contact administrator.', 'warning')
-                conn.close()
                 return redirect(url_for('course_detail', course_id=course_id))
             
-            # Create enrollment request
+            # Create enrollment request; a single autocommit INSERT holds the write lock only for itself
             try:
-                conn.execute('''
+                cursor = self.course_repo._execute_with_retry(lambda: conn.execute('''
                     INSERT INTO enrollments (user_id, course_id, approval_status, enrolled_at)
                     VALUES (?, ?, 'pending', CURRENT_TIMESTAMP)
-                ''', (session['user_id'], course_id))
-                
-                conn.commit()
-                conn.close()
+                    ON CONFLICT (user_id, course_id) DO NOTHING
+                ''', (session['user_id'], course_id)))
                 
-                flash('Enrollment request submitted successfully! Please wait for admin approval.', 'success')
+                if cursor.rowcount == 0:
+                    # A concurrent request enrolled first
+                    flash('Your enrollment request is already pending approval.', 'info')
+                else:
+                    self.course_repo._invalidate_caches()
+                    flash('Enrollment request submitted successfully! Please wait for admin approval.', 'success')
                 
             except Exception as e:
-                conn.rollback()
-                conn.close()
                 flash(f'Failed to submit enrollment request: {str(e)}', 'error')
             
             return redirect(url_for('course_detail', course_id=course_id))
@@ -847,10 +1131,12 @@ class CourseManager:
                 flash('Course not found.', 'error')
                 return redirect(url_for('admin_courses'))
             
-            modules = self.course_repo.get_course_modules(course_id)
-            
-            return render_template('admin_course_modules.html', 
-                                 course=course, modules=modules)
+            return self._render_with_etag(
+                ('courses', 'lessons', 'enrollments', 'users'), 'admin_course_modules.html',
+                # Loaded uncached, so the page always matches the versions in its ETag
+                lambda: {'course': self.course_repo._load_course(course_id),
+                         'modules': self.course_repo.get_course_modules(course_id)}
+            )
         
         @self.app.route('/admin/courses/<int:course_id>/modules/create', methods=['GET', 'POST'])
         def admin_create_module(course_id):
@@ -881,16 +1167,14 @@ class CourseManager:
                     'additional_resources': request.form.get('additional_resources', '')
                 }
                 
-                # Add file path to content if file was uploaded
-                if uploaded_file:
-                    if module_data['content']:
-                        module_data['content'] += f"\n\n**Attached File:** {uploaded_file['filename']}\n**File Path:** {uploaded_file['path']}"
-                    else:
-                        module_data['content'] = f"**Attached File:** {uploaded_file['filename']}\n**File Path:** {uploaded_file['path']}"
-                
                 success, message, module_id = self.course_repo.create_module(module_data)
                 flash(message, 'success' if success else 'error')
                 
+                if success and uploaded_file:
+                    attached, attach_message = self.course_repo.add_attachment(module_id, uploaded_file)
+                    if not attached:
+                        flash(attach_message, 'error')
+                
                 if success:
                     return redirect(url_for('admin_course_modules', course_id=course_id))
             
@@ -924,21 +1208,37 @@ class CourseManager:
                     'additional_resources': request.form.get('additional_resources', '')
                 }
                 
-                # Add file path to content if file was uploaded
-                if uploaded_file:
-                    if module_data['content']:
-                        module_data['content'] += f"\n\n**Attached File:** {uploaded_file['filename']}\n**File Path:** {uploaded_file['path']}"
-                    else:
-                        module_data['content'] = f"**Attached File:** {uploaded_file['filename']}\n**File Path:** {uploaded_file['path']}"
-                
                 success, message = self.course_repo.update_module(module_id, module_data)
                 flash(message, 'success' if success else 'error')
                 
+                if success and uploaded_file:
+                    attached, attach_message = self.course_repo.add_attachment(module_id, uploaded_file)
+                    if not attached:
+                        flash(attach_message, 'error')
+                
                 if success:
                     return redirect(url_for('admin_course_modules', course_id=module['course_id']))
             
             return render_template('admin_edit_module.html', module=module)
         
+        @self.app.route('/admin/modules/<int:module_id>/upload', methods=['POST'])
+        def admin_upload_module_file(module_id):
+            """Attach a file sent as the raw request body (named by X-Filename), streamed to disk in chunks."""
+            if not self._check_admin_access():
+                return jsonify({'success': False, 'message': 'Access denied'}), 403
+            
+            module = self.course_repo.get_module_by_id(module_id)
+            if not module:
+                return jsonify({'success': False, 'message': 'Module not found'}), 404
+            
+            original_filename = request.headers.get('X-Filename', '')
+            if not secure_filename(original_filename):
+                return jsonify({'success': False, 'message': 'X-Filename header is required'}), 400
+            
+            uploaded_file = self._store_upload(request.stream, original_filename, module['course_id'])
+            success, message = self.course_repo.add_attachment(module_id, uploaded_file)
+            return jsonify({'success': success, 'message': message, 'path': uploaded_file['path']})
+        
         @self.app.route('/admin/modules/<int:module_id>/delete', methods=['POST'])
         def admin_delete_module(module_id):
             """Admin module deletion."""
@@ -975,12 +1275,7 @@ class CourseManager:
                 flash('Course not found.', 'error')
                 return redirect(url_for('courses'))
             
-            modules = self.course_repo.get_course_modules(course_id)
-            
-            # Get user progress for each module
-            for module in modules:
-                progress = self.course_repo.get_user_module_progress(session['user_id'], module['id'])
-                module['progress'] = progress
+            modules = self.course_repo.get_course_modules_with_progress(session['user_id'], course_id)
             
             return render_template('course_modules_student.html', 
                                  course=course, modules=modules, enrollment=enrollment)
@@ -1003,46 +1298,96 @@ class CourseManager:
                 flash('You must be enrolled and approved to access this module.', 'error')
                 return redirect(url_for('course_detail', course_id=module['course_id']))
             
-            # Get user progress
-            progress = self.course_repo.get_user_module_progress(session['user_id'], module_id)
+            # Get all modules for navigation with the user's progress in one query, then pick this module's
+            all_modules = self.course_repo.get_course_modules_with_progress(session['user_id'], module['course_id'])
+            progress = next((m['progress'] for m in all_modules if m['id'] == module_id), None)
             
-            # Get all modules for navigation
-            all_modules = self.course_repo.get_course_modules(module['course_id'])
+            attachments = self.course_repo.get_module_attachments(module_id)
             
             return render_template('module_viewer.html', 
-                                 module=module, progress=progress, 
+                                 module=module, progress=progress, attachments=attachments,
                                  all_modules=all_modules, enrollment=enrollment)
         
         @self.app.route('/module/<int:module_id>/complete', methods=['POST'])
+        @login_required_json
         def student_complete_module(module_id):
             """Mark module as completed (AJAX endpoint)."""
-            if 'user_id' not in session:
-                return jsonify({'success': False, 'message': 'Not logged in'})
-            
-            module = self.course_repo.get_module_by_id(module_id)
-            if not module:
-                return jsonify({'success': False, 'message': 'Module not found'})
-            
-            # Check if user is enrolled and approved
-            enrollment = self.course_repo.check_user_enrollment(session['user_id'], module['course_id'])
-            if not enrollment and session.get('role') != 'admin':
-                return jsonify({'success': False, 'message': 'Access denied'})
+            # Admins can open every module but don't get progress tracking
+            if session.get('role') == 'admin':
+                if not self.course_repo.get_module_by_id(module_id):
+                    return jsonify({'success': False, 'message': 'Module not found'})
+                return jsonify({'success': True, 'message': 'Admin access - progress not tracked.'})
             
             time_spent = self._safe_int(request.form.get('time_spent'), 0)
-            success, message = self.course_repo.mark_module_complete(session['user_id'], module_id, time_spent)
+            success, message = self.course_repo.mark_module_complete_if_enrolled(session['user_id'], module_id, time_spent)
             
             return jsonify({'success': success, 'message': message})
         
         # File Download Route
         @self.app.route('/uploads/<path:filename>')
         def download_file(filename):
-            """Serve uploaded files (requires authentication)."""
-            if 'user_id' not in session:
+            """Serve uploaded files (requires authentication or a valid signed link)."""
+            expires = self._safe_int(request.args.get('exp'))
+            signed = self._verify_upload_signature(filename, expires, request.args.get('sig', ''))
+            if not signed and 'user_id' not in session:
                 flash('Please log in to access files.', 'error')
                 return redirect(url_for('login'))
             
-            upload_folder = os.path.join(os.getcwd(), 'static', 'uploads')
-            return send_from_directory(upload_folder, filename)
+            # Behind Nginx, let the proxy send the bytes once access is checked
+            if X_ACCEL_REDIRECT_PREFIX:
+                if safe_join(X_ACCEL_REDIRECT_PREFIX, filename) is None:
+                    abort(404)
+                return Response(headers={'X-Accel-Redirect': f'{X_ACCEL_REDIRECT_PREFIX}/{filename}'})
+            
+            response = send_from_directory(UPLOAD_FOLDER, filename)
+            if signed:
+                # The URL itself grants access, so a proxy may reuse the response until the link expires
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = max(0, expires - int(time.time()))
+            return response
+    
+    def _render_with_etag(self, tables, template_name, load_context):
+        """Render a page with a weak ETag derived from the tables it reads; 304 (without loading
+        the page data) when the client's copy is current."""
+        # Flashed messages are one-off, so those responses are never validated
+        if '_flashes' in session:
+            return render_template(template_name, **load_context())
+        
+        versions = ','.join(f"{row['name']}={row['version']}" for row in self.course_repo.get_data_versions(tables))
+        source = f"{self._etag_seed}|{versions}|{session.get('user_id')}|{session.get('full_name')}|{request.full_path}"
+        etag = hashlib.blake2b(source.encode(), digest_size=8).hexdigest()
+        
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(render_template(template_name, **load_context()))
+        response.set_etag(etag, weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    
+    def _upload_signer(self):
+        """Signer for download links, keyed on the app secret."""
+        return Signer(self.app.secret_key, salt='upload-download')
+    
+    def _signed_upload_url(self, path):
+        """Template filter: add an expiring signature to an /uploads/... path."""
+        if not path.startswith('/uploads/'):
+            return path
+        filename = path[len('/uploads/'):]
+        expires = (int(time.time()) // SIGNED_URL_WINDOW + 2) * SIGNED_URL_WINDOW
+        signature = self._upload_signer().get_signature(f'{filename}:{expires}').decode('ascii')
+        return url_for('download_file', filename=filename, exp=expires, sig=signature)
+    
+    def _verify_upload_signature(self, filename, expires, signature):
+        """Check a download link's signature and expiry."""
+        if not signature or expires < time.time():
+            return False
+        try:
+            return self._upload_signer().verify_signature(f'{filename}:{expires}', signature)
+        except BadSignature:
+            return False
     
     def _check_admin_access(self):
         """Check if current user has admin access."""
@@ -1060,25 +1405,54 @@ class CourseManager:
         if not file or not file.filename:
             return None
         
+        file.stream.seek(0)
+        return self._store_upload(file.stream, file.filename, course_id)
+    
+    def _store_upload(self, stream, original_filename, course_id):
+        """Save an uploaded stream under its content hash, skipping the write if the course already has it."""
         # Create upload directory if it doesn't exist
-        upload_folder = os.path.join(os.getcwd(), 'static', 'uploads', 'courses', str(course_id))
-        os.makedirs(upload_folder, exist_ok=True)
+        upload_folder = os.path.join(UPLOAD_ROOT, str(course_id))
+        _ensure_upload_dir(upload_folder)
         
-        # Secure the filename
-        filename = secure_filename(file.filename)
+        digest = hashlib.blake2b(digest_size=16)
+        spooled_path = getattr(stream, 'name', None)
         
-        # Add timestamp to avoid conflicts
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-        filename = timestamp + filename
+        if isinstance(spooled_path, str):
+            # Parts spooled to disk by UploadRequest only need hashing; they are linked into place below
+            while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+            temp_path = None
+        else:
+            _ensure_upload_dir(UPLOAD_SPOOL_DIR)
+            with tempfile.NamedTemporaryFile('wb', dir=UPLOAD_SPOOL_DIR, delete=False) as temp:
+                while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    temp.write(chunk)
+            temp_path = spooled_path = temp.name
         
-        # Save the file
+        extension = os.path.splitext(secure_filename(original_filename))[1].lower()
+        filename = digest.hexdigest() + extension
         file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
         
-        # Return file info
+        try:
+            if not os.path.exists(file_path):
+                if temp_path:
+                    os.replace(temp_path, file_path)
+                    temp_path = None
+                else:
+                    try:
+                        os.link(spooled_path, file_path)
+                    except FileExistsError:
+                        pass
+                    except OSError:
+                        shutil.copyfile(spooled_path, file_path)
+        finally:
+            if temp_path:
+                os.unlink(temp_path)
+        
         return {
-            'filename': file.filename,  # Original filename
-            'saved_filename': filename,  # Saved filename with timestamp
+            'filename': original_filename,  # Original filename
+            'saved_filename': filename,  # Saved filename (content hash)
             'path': f'/uploads/courses/{course_id}/{filename}',  # Web-accessible path
             'full_path': file_path  # Full system path
         }
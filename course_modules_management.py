@@ -12,95 +12,205 @@ This module handles all aspects of course modules/lessons including:
 
 import sqlite3
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, g, has_app_context
+from base_repository import BaseRepository
 
+# Seconds a cached module listing or module stays fresh, and how many entries are kept
+MODULE_CACHE_TTL = 60
+MODULE_CACHE_SIZE = 512
 
-class CourseModulesRepository:
+# Course columns selected alongside module rows, aliased with a course_ prefix
+COURSE_COLUMNS = ('id', 'title', 'description', 'category', 'level', 'duration_hours',
+                  'instructor_id', 'is_published', 'created_at')
+COURSE_SELECT = ', '.join(f'c.{column} as course_{column}' for column in COURSE_COLUMNS)
+COURSE_KEYS = tuple((column, f'course_{column}') for column in COURSE_COLUMNS)
+
+# Statements that splice in the course columns, built once at import
+MODULE_WITH_COURSE_SQL = f'''
+    SELECT l.*, {COURSE_SELECT},
+           COUNT(DISTINCT up.user_id) as students_completed,
+           AVG(up.time_spent) as avg_time_spent
+    FROM lessons l
+    JOIN courses c ON l.course_id = c.id
+    LEFT JOIN user_progress up ON l.id = up.lesson_id AND up.completed = 1
+    WHERE l.id = ?
+    GROUP BY l.id
+'''
+
+# Course columns come first so course_id resolves to the course even when it has no modules
+COURSE_WITH_MODULES_SQL = f'''
+    SELECT {COURSE_SELECT}, l.*,
+           COALESCE(up.students_completed, 0) as students_completed,
+           up.avg_time_spent
+    FROM courses c
+    LEFT JOIN lessons l ON l.course_id = c.id
+    LEFT JOIN (
+        SELECT lesson_id,
+               COUNT(DISTINCT user_id) as students_completed,
+               AVG(time_spent) as avg_time_spent
+        FROM user_progress
+        WHERE completed = 1
+        GROUP BY lesson_id
+    ) up ON up.lesson_id = l.id
+    WHERE c.id = ?
+    ORDER BY l.lesson_order
+'''
+
+# Module types offered by the admin create/edit forms
+MODULE_TYPES = (
+    {'value': 'text', 'label': 'Text/Reading', 'icon': 'fas fa-file-text'},
+    {'value': 'video', 'label': 'Video', 'icon': 'fas fa-video'},
+    {'value': 'audio', 'label': 'Audio', 'icon': 'fas fa-volume-up'},
+    {'value': 'presentation', 'label': 'Presentation', 'icon': 'fas fa-presentation'},
+    {'value': 'interactive', 'label': 'Interactive', 'icon': 'fas fa-mouse-pointer'},
+    {'value': 'quiz', 'label': 'Quiz/Assessment', 'icon': 'fas fa-question-circle'},
+    {'value': 'assignment', 'label': 'Assignment', 'icon': 'fas fa-tasks'},
+    {'value': 'discussion', 'label': 'Discussion', 'icon': 'fas fa-comments'}
+)
+
+
+class CourseModulesRepository(BaseRepository):
     """Repository class for handling course modules database operations."""
     
     def __init__(self, db_connection_func):
         """Initialize with database connection function."""
-        self.get_db_connection = db_connection_func
+        super().__init__(db_connection_func)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Bumped by every invalidation, so a read that raced a write doesn't store the value it saw
+        self._cache_generation = 0
+    
+    def _cached(self, key, loader):
+        """Return the cached value for key, reloading it once older than MODULE_CACHE_TTL (least recently used evicted first)."""
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[0] < MODULE_CACHE_TTL:
+                self._cache.move_to_end(key)
+                return entry[1]
+            generation = self._cache_generation
+        
+        value = loader()
+        # Missing rows aren't cached, so lookups of nonexistent ids can't fill the cache
+        if value is not None:
+            with self._cache_lock:
+                # Skip storing if a write was invalidated while loader() ran; the value may predate it
+                if self._cache_generation == generation:
+                    self._cache[key] = (now, value)
+                    self._cache.move_to_end(key)
+                    if len(self._cache) > MODULE_CACHE_SIZE:
+                        self._cache.popitem(last=False)
+        return value
+    
+    def _invalidate_caches(self):
+        """Drop every cached module listing and module after a change."""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._cache.clear()
+    
+    def get_course(self, course_id):
+        """Get a course row by ID."""
+        return self._conn().execute('SELECT * FROM courses WHERE id = ?', (course_id,)).fetchone()
     
     def get_course_modules(self, course_id):
-        """Get all modules for a specific course."""
-        conn = self.get_db_connection()
+        """Get all modules for a specific course with completion statistics."""
+        conn = self._conn()
         
+        # Aggregate progress per lesson once, then attach it to each module
         modules = conn.execute('''
             SELECT l.*, 
-                   COUNT(DISTINCT up.user_id) as students_completed,
-                   AVG(up.time_spent) as avg_time_spent
+                   COALESCE(up.students_completed, 0) as students_completed,
+                   up.avg_time_spent
             FROM lessons l
-            LEFT JOIN user_progress up ON l.id = up.lesson_id AND up.completed = 1
+            LEFT JOIN (
+                SELECT lesson_id,
+                       COUNT(DISTINCT user_id) as students_completed,
+                       AVG(time_spent) as avg_time_spent
+                FROM user_progress
+                WHERE completed = 1
+                GROUP BY lesson_id
+            ) up ON up.lesson_id = l.id
             WHERE l.course_id = ?
-            GROUP BY l.id
             ORDER BY l.lesson_order
         ''', (course_id,)).fetchall()
         
-        conn.close()
-        return [dict(module) for module in modules]
+        return modules
+    
+    def get_course_modules_basic(self, course_id):
+        """Get module rows for a course without completion statistics."""
+        return self._cached(('modules', course_id), lambda: self._conn().execute(
+            'SELECT * FROM lessons WHERE course_id = ? ORDER BY lesson_order',
+            (course_id,)
+        ).fetchall())
     
     def get_module_by_id(self, module_id):
-        """Get a specific module by ID with detailed information."""
-        conn = self.get_db_connection()
+        """Get a specific module by ID with detailed information and its course's columns (prefixed course_)."""
+        return self._cached(('module', module_id), lambda: self._load_module(module_id))
+    
+    def _load_module(self, module_id):
+        """Load a module with its completion statistics and course columns."""
+        conn = self._conn()
         
-        module = conn.execute('''
-            SELECT l.*, c.title as course_title, c.id as course_id,
-                   COUNT(DISTINCT up.user_id) as students_completed,
-                   AVG(up.time_spent) as avg_time_spent
-            FROM lessons l
-            JOIN courses c ON l.course_id = c.id
-            LEFT JOIN user_progress up ON l.id = up.lesson_id AND up.completed = 1
-            WHERE l.id = ?
-            GROUP BY l.id
-        ''', (module_id,)).fetchone()
+        module = conn.execute(MODULE_WITH_COURSE_SQL, (module_id,)).fetchone()
         
-        conn.close()
         return dict(module) if module else None
     
+    def course_from_module(self, module):
+        """Extract the course fields carried on a module from get_module_by_id."""
+        return {column: module[key] for column, key in COURSE_KEYS}
+    
+    def get_course_with_modules(self, course_id):
+        """Get a course and its modules with completion statistics in one query."""
+        conn = self._conn()
+        
+        rows = conn.execute(COURSE_WITH_MODULES_SQL, (course_id,)).fetchall()
+        
+        if not rows:
+            return None, []
+        
+        return self.course_from_module(rows[0]), [row for row in rows if row['id'] is not None]
+    
     def create_module(self, course_id, module_data):
         """Create a new course module."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            # Get the next lesson order
-            max_order = conn.execute(
-                'SELECT MAX(lesson_order) as max_order FROM lessons WHERE course_id = ?',
-                (course_id,)
-            ).fetchone()
-            
-            next_order = (max_order['max_order'] or 0) + 1
-            
-            # Insert the new module
+            # Insert the new module after the course's last one in a single statement
             cursor = conn.execute('''
                 INSERT INTO lessons (
                     title, content, lesson_type, duration_minutes, lesson_order, 
                     course_id, learning_objectives, additional_resources, 
                     created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (
-                module_data['title'], module_data['content'], 
-                module_data['lesson_type'], module_data.get('duration_minutes'),
-                next_order, course_id, 
-                module_data.get('learning_objectives'), 
-                module_data.get('additional_resources')
-            ))
+                )
+                SELECT :title, :content, :lesson_type, :duration_minutes,
+                       COALESCE(MAX(lesson_order), 0) + 1, :course_id,
+                       :learning_objectives, :additional_resources, CURRENT_TIMESTAMP
+                FROM lessons WHERE course_id = :course_id
+            ''', {
+                'title': module_data['title'], 'content': module_data['content'],
+                'lesson_type': module_data['lesson_type'],
+                'duration_minutes': module_data.get('duration_minutes'),
+                'course_id': course_id,
+                'learning_objectives': module_data.get('learning_objectives'),
+                'additional_resources': module_data.get('additional_resources')
+            })
             
             module_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            
+            self._invalidate_caches()
             
             return True, f'Module "{module_data["title"]}" created successfully.', module_id
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to create module: {str(e)}', None
     
     def update_module(self, module_id, module_data):
         """Update an existing module."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
             conn.execute('''
@@ -116,129 +226,112 @@ class CourseModulesRepository:
                 module_id
             ))
             
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
             return True, 'Module updated successfully.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to update module: {str(e)}'
     
     def delete_module(self, module_id):
-        """Delete a module and all related progress data."""
-        conn = self.get_db_connection()
+        """Delete a module and all related progress data, returning the module's course_id."""
+        conn = self._conn()
         
         try:
-            # Get module info for confirmation
-            module = conn.execute(
-                'SELECT title, course_id FROM lessons WHERE id = ?', 
-                (module_id,)
-            ).fetchone()
-            
-            if not module:
-                conn.close()
-                return False, 'Module not found.'
-            
-            # Delete user progress for this module
-            conn.execute('DELETE FROM user_progress WHERE lesson_id = ?', (module_id,))
-            
-            # Delete the module
-            conn.execute('DELETE FROM lessons WHERE id = ?', (module_id,))
-            
-            # Reorder remaining modules
-            modules = conn.execute('''
-                SELECT id FROM lessons WHERE course_id = ? ORDER BY lesson_order
-            ''', (module['course_id'],)).fetchall()
-            
-            for i, mod in enumerate(modules, 1):
-                conn.execute(
-                    'UPDATE lessons SET lesson_order = ? WHERE id = ?',
-                    (i, mod['id'])
-                )
+            with self._tx(conn):
+                # Get module info for confirmation
+                module = conn.execute(
+                    'SELECT title, course_id FROM lessons WHERE id = ?', 
+                    (module_id,)
+                ).fetchone()
+                
+                if not module:
+                    return False, 'Module not found.', None
+                
+                # Delete user progress for this module
+                conn.execute('DELETE FROM user_progress WHERE lesson_id = ?', (module_id,))
+                
+                # Delete the module
+                conn.execute('DELETE FROM lessons WHERE id = ?', (module_id,))
+                
+                # Renumber the remaining modules in one batched statement
+                remaining = conn.execute('''
+                    SELECT id FROM lessons WHERE course_id = ? ORDER BY lesson_order
+                ''', (module['course_id'],))
+                new_orders = [(order, row[0]) for order, row in enumerate(remaining, 1)]
+                
+                conn.executemany('UPDATE lessons SET lesson_order = ? WHERE id = ?', new_orders)
             
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
-            return True, f'Module "{module["title"]}" deleted successfully.'
+            return True, f'Module "{module["title"]}" deleted successfully.', module['course_id']
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
-            return False, f'Failed to delete module: {str(e)}'
+            return False, f'Failed to delete module: {str(e)}', None
     
     def reorder_modules(self, course_id, module_order):
         """Reorder modules in a course."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            for order, module_id in enumerate(module_order, 1):
-                conn.execute(
-                    'UPDATE lessons SET lesson_order = ? WHERE id = ? AND course_id = ?',
-                    (order, module_id, course_id)
+            module_ids = [int(module_id) for module_id in module_order]
+            
+            with self._tx(conn):
+                # Check once that every id is a distinct module of this course
+                owned = conn.execute('''
+                    SELECT COUNT(*) FROM lessons
+                    WHERE course_id = ? AND id IN (SELECT value FROM json_each(?))
+                ''', (course_id, json.dumps(module_ids))).fetchone()[0]
+                
+                if owned != len(module_ids):
+                    return False, 'Module order contains modules from another course.'
+                
+                conn.executemany(
+                    'UPDATE lessons SET lesson_order = ? WHERE id = ?',
+                    [(order, module_id) for order, module_id in enumerate(module_ids, 1)]
                 )
             
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
             return True, 'Modules reordered successfully.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to reorder modules: {str(e)}'
     
     def duplicate_module(self, module_id):
-        """Create a duplicate of an existing module."""
-        conn = self.get_db_connection()
+        """Create a duplicate of an existing module, returning the new module's id and course_id."""
+        conn = self._conn()
         
         try:
-            # Get original module data
-            original = conn.execute(
-                'SELECT * FROM lessons WHERE id = ?', 
-                (module_id,)
-            ).fetchone()
-            
-            if not original:
-                conn.close()
-                return False, 'Module not found.', None
-            
-            # Get next order number
-            max_order = conn.execute(
-                'SELECT MAX(lesson_order) as max_order FROM lessons WHERE course_id = ?',
-                (original['course_id'],)
-            ).fetchone()
-            
-            next_order = (max_order['max_order'] or 0) + 1
-            
-            # Create duplicate
-            cursor = conn.execute('''
+            # Copy the module to the end of its course in a single statement
+            rows = conn.execute('''
                 INSERT INTO lessons (
                     title, content, lesson_type, duration_minutes, lesson_order,
                     course_id, learning_objectives, additional_resources, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (
-                f"{original['title']} (Copy)", original['content'],
-                original['lesson_type'], original['duration_minutes'],
-                next_order, original['course_id'],
-                original['learning_objectives'], original['additional_resources']
-            ))
+                )
+                SELECT o.title || ' (Copy)', o.content, o.lesson_type, o.duration_minutes,
+                       (SELECT COALESCE(MAX(lesson_order), 0) + 1 FROM lessons WHERE course_id = o.course_id),
+                       o.course_id, o.learning_objectives, o.additional_resources, CURRENT_TIMESTAMP
+                FROM lessons o
+                WHERE o.id = ?
+                RETURNING id, course_id
+            ''', (module_id,)).fetchall()
+            
+            if not rows:
+                return False, 'Module not found.', None, None
+            
+            new_module_id, course_id = rows[0]
             
-            new_module_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
+            self._invalidate_caches()
             
-            return True, f'Module duplicated successfully.', new_module_id
+            return True, f'Module duplicated successfully.', new_module_id, course_id
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
-            return False, f'Failed to duplicate module: {str(e)}', None
+            return False, f'Failed to duplicate module: {str(e)}', None, None
     
     def get_user_module_progress(self, user_id, course_id):
         """Get user's progress for all modules in a course."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         progress = conn.execute('''
             SELECT l.id as lesson_id, l.title, l.lesson_order,
@@ -249,86 +342,92 @@ class CourseModulesRepository:
             ORDER BY l.lesson_order
         ''', (user_id, course_id)).fetchall()
         
-        conn.close()
-        return [dict(p) for p in progress]
+        return progress
+    
+    def get_course_modules_with_progress(self, user_id, course_id):
+        """Get all modules in a course together with the user's progress on each."""
+        conn = self._conn()
+        
+        modules = conn.execute('''
+            SELECT l.*, l.id as lesson_id,
+                   up.completed, up.completed_at, up.time_spent
+            FROM lessons l
+            LEFT JOIN user_progress up ON l.id = up.lesson_id AND up.user_id = ?
+            WHERE l.course_id = ?
+            ORDER BY l.lesson_order
+        ''', (user_id, course_id)).fetchall()
+        
+        return modules
     
     def mark_module_complete(self, user_id, module_id, time_spent=0):
         """Mark a module as completed for a user (excludes admin users)."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            # Check if user is admin - admins don't get progress tracking
-            user_role = conn.execute(
-                'SELECT role FROM users WHERE id = ?', (user_id,)
-            ).fetchone()
-            
-            if user_role and user_role['role'] == 'admin':
-                conn.close()
+            # The admin check and the progress upsert are one statement;
+            # admins don't get progress tracking
+            cursor = conn.execute('''
+                INSERT INTO user_progress (user_id, lesson_id, completed, completed_at, time_spent)
+                SELECT ?1, ?2, 1, CURRENT_TIMESTAMP, ?3
+                WHERE (SELECT role FROM users WHERE id = ?1) IS NOT 'admin'
+                ON CONFLICT (user_id, lesson_id) DO UPDATE
+                SET completed = 1, completed_at = CURRENT_TIMESTAMP, time_spent = excluded.time_spent
+            ''', (user_id, module_id, time_spent))
+            
+            if cursor.rowcount == 0:
                 return True, 'Admin access - progress not tracked.'
             
-            # Check if progress record exists
-            existing = conn.execute(
-                'SELECT id FROM user_progress WHERE user_id = ? AND lesson_id = ?',
-                (user_id, module_id)
-            ).fetchone()
-            
-            if existing:
-                # Update existing record
-                conn.execute('''
-                    UPDATE user_progress 
-                    SET completed = 1, completed_at = CURRENT_TIMESTAMP, time_spent = ?
-                    WHERE user_id = ? AND lesson_id = ?
-                ''', (time_spent, user_id, module_id))
-            else:
-                # Create new progress record
-                conn.execute('''
-                    INSERT INTO user_progress (user_id, lesson_id, completed, completed_at, time_spent)
-                    VALUES (?, ?, 1, CURRENT_TIMESTAMP, ?)
-                ''', (user_id, module_id, time_spent))
-            
-            conn.commit()
-            conn.close()
+            # Only this module's completion statistics changed
+            with self._cache_lock:
+                self._cache_generation += 1
+                self._cache.pop(('module', module_id), None)
             
             return True, 'Module marked as completed.'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Failed to mark module as completed: {str(e)}'
     
-    def check_module_access(self, user_id, course_id):
-        """Check if user has access to course modules."""
-        conn = self.get_db_connection()
+    def check_module_access(self, user_id, course_id, session_role=None):
+        """Check if user has access to course modules (memoized for the rest of the request)."""
+        # The login session already says whether the user is an admin
+        if session_role == 'admin':
+            return True, "Admin access granted"
+        
+        if not has_app_context():
+            return self._load_module_access(user_id, course_id)
+        
+        if 'module_access' not in g:
+            g.module_access = {}
+        key = (user_id, course_id)
+        if key not in g.module_access:
+            g.module_access[key] = self._load_module_access(user_id, course_id)
+        return g.module_access[key]
+    
+    def _load_module_access(self, user_id, course_id):
+        """Look up the user's role, approval and enrollment status in one query."""
+        conn = self._conn()
         
-        # Check user approval status and role
-        user = conn.execute(
-            'SELECT approval_status, role FROM users WHERE id = ?', 
-            (user_id,)
-        ).fetchone()
+        user = conn.execute('''
+            SELECT u.approval_status, u.role, e.approval_status as enrollment_status
+            FROM users u
+            LEFT JOIN enrollments e ON e.user_id = u.id AND e.course_id = ?
+            WHERE u.id = ?
+        ''', (course_id, user_id)).fetchone()
         
         if not user:
-            conn.close()
             return False, "User not found"
         
         # Admin users always have access to all modules
         if user['role'] == 'admin':
-            conn.close()
             return True, "Admin access granted"
         
         # Check enrollment status for non-admin users
-        enrollment = conn.execute(
-            'SELECT approval_status FROM enrollments WHERE user_id = ? AND course_id = ?',
-            (user_id, course_id)
-        ).fetchone()
-        
-        conn.close()
-        
-        if not enrollment:
+        if user['enrollment_status'] is None:
             return False, "Please request enrollment in this course first to access the modules"
         
         # Both user and enrollment must be approved for module access
         user_approved = user['approval_status'] == 'approved'
-        enrollment_approved = enrollment['approval_status'] == 'approved'
+        enrollment_approved = user['enrollment_status'] == 'approved'
         
         if not user_approved:
             return False, "Your account is pending admin approval. You'll gain access once approved"
@@ -340,17 +439,7 @@ class CourseModulesRepository:
     
     def get_module_types(self):
         """Get available module types."""
-        return [
-            {'value': 'text', 'label': 'Text/Reading', 'icon': 'fas fa-file-text'},
-            {'value': 'video', 'label': 'Video', 'icon': 'fas fa-video'},
-            {'value': 'audio', 'label': 'Audio', 'icon': 'fas fa-volume-up'},
-            {'value': 'presentation', 'label': 'Presentation', 'icon': 'fas fa-presentation'},
-            {'value': 'interactive', 'label': 'Interactive', 'icon': 'fas fa-mouse-pointer'},
-            {'value': 'quiz', 'label': 'Quiz/Assessment', 'icon': 'fas fa-question-circle'},
-            {'value': 'assignment', 'label': 'Assignment', 'icon': 'fas fa-tasks'},
-            {'value': 'discussion', 'label': 'Discussion', 'icon': 'fas fa-comments'}
-        ]
-
+        return MODULE_TYPES
 
 class CourseModulesManager:
     """Manager class for handling course modules routes and business logic."""
@@ -371,12 +460,12 @@ class CourseModulesManager:
                 return redirect(url_for('login'))
             
             # Check module access
-            has_access, message = self.modules_repo.check_module_access(session['user_id'], course_id)
+            has_access, message = self.modules_repo.check_module_access(
+                session['user_id'], course_id, session.get('role')
+            )
             
             # Get course info
-            conn = self.modules_repo.get_db_connection()
-            course = conn.execute('SELECT * FROM courses WHERE id = ?', (course_id,)).fetchone()
-            conn.close()
+            course = self.modules_repo.get_course(course_id)
             
             if not course:
                 flash('Course not found.', 'error')
@@ -386,9 +475,9 @@ class CourseModulesManager:
                 flash(message, 'info')
                 return redirect(url_for('course_detail', course_id=course_id))
             
-            # Get modules and user progress
-            modules = self.modules_repo.get_course_modules(course_id)
-            user_progress = self.modules_repo.get_user_module_progress(session['user_id'], course_id)
+            # Modules and user progress come from one query; each row carries both
+            modules = self.modules_repo.get_course_modules_with_progress(session['user_id'], course_id)
+            user_progress = modules
             
             return render_template('course_modules_list.html', 
                                  course=course, modules=modules, user_progress=user_progress)
@@ -406,17 +495,15 @@ class CourseModulesManager:
             
             # Check access
             has_access, message = self.modules_repo.check_module_access(
-                session['user_id'], module['course_id']
+                session['user_id'], module['course_id'], session.get('role')
             )
             
             if not has_access:
                 flash(message, 'info')
                 return redirect(url_for('course_detail', course_id=module['course_id']))
             
-            # Get course info
-            conn = self.modules_repo.get_db_connection()
-            course = conn.execute('SELECT * FROM courses WHERE id = ?', (module['course_id'],)).fetchone()
-            conn.close()
+            # Course info is already on the module row
+            course = self.modules_repo.course_from_module(module)
             
             return render_template('module_view.html', module=module, course=course)
         
@@ -441,17 +528,12 @@ class CourseModulesManager:
             if not self._check_admin_access():
                 return redirect(url_for('login'))
             
-            # Get course info
-            conn = self.modules_repo.get_db_connection()
-            course = conn.execute('SELECT * FROM courses WHERE id = ?', (course_id,)).fetchone()
-            conn.close()
+            course, modules = self.modules_repo.get_course_with_modules(course_id)
             
             if not course:
                 flash('Course not found.', 'error')
                 return redirect(url_for('admin_courses'))
             
-            modules = self.modules_repo.get_course_modules(course_id)
-            
             return render_template('admin_manage_modules.html', course=course, modules=modules)
         
         @self.app.route('/admin/courses/<int:course_id>/modules/create', methods=['GET', 'POST'])
@@ -477,9 +559,7 @@ class CourseModulesManager:
                     return redirect(url_for('admin_manage_modules', course_id=course_id))
             
             # Get course info
-            conn = self.modules_repo.get_db_connection()
-            course = conn.execute('SELECT * FROM courses WHERE id = ?', (course_id,)).fetchone()
-            conn.close()
+            course = self.modules_repo.get_course(course_id)
             
             if not course:
                 flash('Course not found.', 'error')
@@ -528,15 +608,13 @@ class CourseModulesManager:
             if not self._check_admin_access():
                 return redirect(url_for('login'))
             
-            module = self.modules_repo.get_module_by_id(module_id)
-            if not module:
-                flash('Module not found.', 'error')
-                return redirect(url_for('admin_courses'))
-            
-            success, message = self.modules_repo.delete_module(module_id)
+            success, message, course_id = self.modules_repo.delete_module(module_id)
             flash(message, 'success' if success else 'error')
             
-            return redirect(url_for('admin_manage_modules', course_id=module['course_id']))
+            if course_id is None:
+                return redirect(url_for('admin_courses'))
+            
+            return redirect(url_for('admin_manage_modules', course_id=course_id))
         
         @self.app.route('/admin/modules/<int:module_id>/duplicate', methods=['POST'])
         def admin_duplicate_module(module_id):
@@ -544,15 +622,13 @@ class CourseModulesManager:
             if not self._check_admin_access():
                 return redirect(url_for('login'))
             
-            module = self.modules_repo.get_module_by_id(module_id)
-            if not module:
-                flash('Module not found.', 'error')
-                return redirect(url_for('admin_courses'))
-            
-            success, message, new_module_id = self.modules_repo.duplicate_module(module_id)
+            success, message, new_module_id, course_id = self.modules_repo.duplicate_module(module_id)
             flash(message, 'success' if success else 'error')
             
-            return redirect(url_for('admin_manage_modules', course_id=module['course_id']))
+            if course_id is None:
+                return redirect(url_for('admin_courses'))
+            
+            return redirect(url_for('admin_manage_modules', course_id=course_id))
         
         @self.app.route('/admin/courses/<int:course_id>/modules/reorder', methods=['POST'])
         def admin_reorder_modules(course_id):
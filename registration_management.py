@@ -9,77 +9,176 @@ This module handles all aspects of user registration including:
 """
 
 import sqlite3
+import gzip
 import hashlib
+import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Response, render_template, request, redirect, url_for, flash, session
+from user_management import hash_password, invalidate_cached_user
+from base_repository import BaseRepository
 
+# Registration field formats, compiled once at import
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+USERNAME_RE = re.compile(r'^[a-zA-Z0-9_]+$')
+PHONE_RE = re.compile(r'^[\+]?[0-9\s\-\(\)]{10,15}$')
+ID_NUMBER_RE = re.compile(r'^[0-9]{7,8}$')
 
-class RegistrationRepository:
+REQUIRED_REGISTRATION_FIELDS = ('username', 'email', 'first_name', 'last_name', 'password', 'phone_number')
+
+# (field, minimum length, pattern, error message), checked in order when the field is non-empty
+REGISTRATION_RULES = (
+    ('email', None, EMAIL_RE, 'Please enter a valid email address'),
+    ('username', 3, None, 'Username must be at least 3 characters long'),
+    ('username', None, USERNAME_RE, 'Username can only contain letters, numbers, and underscores'),
+    ('password', 8, None, 'Password must be at least 8 characters long'),
+    ('phone_number', None, PHONE_RE, 'Please enter a valid phone number'),
+    ('id_number', None, ID_NUMBER_RE, 'National ID number should be 7-8 digits'),
+)
+
+# users columns shown on the profile and registration forms (never the password hash)
+PROFILE_COLUMNS = (
+    'id', 'username', 'email', 'full_name', 'role', 'approval_status', 'created_at',
+    'first_name', 'last_name', 'date_of_birth', 'gender', 'phone_number', 'address', 'city',
+    'state_province', 'postal_code', 'country', 'nationality', 'id_number', 'passport_number',
+    'emergency_contact_name', 'emergency_contact_phone', 'emergency_contact_relationship',
+    'highest_education', 'institution_name', 'graduation_year', 'professional_experience',
+    'current_position', 'organization', 'years_of_experience', 'department',
+    'preferred_course_id', 'motivation', 'how_did_you_hear'
+)
+PROFILE_SELECT = ', '.join(f'u.{column}' for column in PROFILE_COLUMNS)
+
+# The subset shown on the read-only profile page
+PROFILE_SUMMARY_COLUMNS = (
+    'id', 'username', 'email', 'full_name', 'role', 'approval_status', 'created_at',
+    'first_name', 'last_name', 'phone_number', 'department', 'preferred_course_id'
+)
+PROFILE_SUMMARY_SELECT = ', '.join(f'u.{column}' for column in PROFILE_SUMMARY_COLUMNS)
+
+# Shared by single registration and bulk import
+USER_INSERT_SQL = '''
+    INSERT INTO users (
+        username, email, full_name, password_hash, role, is_active, approval_status,
+        first_name, last_name, date_of_birth, gender, phone_number, address, city,
+        state_province, postal_code, country, nationality, id_number, passport_number,
+        emergency_contact_name, emergency_contact_phone, emergency_contact_relationship,
+        highest_education, institution_name, graduation_year, professional_experience,
+        current_position, organization, years_of_experience, department,
+        preferred_course_id, motivation, how_did_you_hear, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+'''
+
+# Shared by complete_registration and edit_profile
+PROFILE_UPDATE_SQL = '''
+    UPDATE users SET
+        first_name = ?, last_name = ?, full_name = ?, phone_number = ?,
+        address = ?, city = ?, state_province = ?, postal_code = ?,
+        country = ?, nationality = ?, emergency_contact_name = ?,
+        emergency_contact_phone = ?, emergency_contact_relationship = ?,
+        highest_education = ?, institution_name = ?, graduation_year = ?,
+        professional_experience = ?, current_position = ?, organization = ?,
+        years_of_experience = ?, department = ?
+    WHERE id = ?
+'''
+
+# Compression level for the pre-gzipped /api/courses body, built once per course change
+COURSES_GZIP_LEVEL = 6
+
+# Free-text profile fields copied straight from the profile forms
+PROFILE_FORM_FIELDS = (
+    'phone_number', 'address', 'city', 'state_province', 'postal_code', 'country',
+    'nationality', 'emergency_contact_name', 'emergency_contact_phone',
+    'emergency_contact_relationship', 'highest_education', 'institution_name',
+    'professional_experience', 'current_position', 'organization', 'department'
+)
+
+# Profile form fields stored as integers
+PROFILE_FORM_INT_FIELDS = ('graduation_year', 'years_of_experience')
+
+# Rows per executemany call when importing users in bulk, and threads hashing their passwords
+BULK_IMPORT_BATCH_SIZE = 5000
+PASSWORD_HASH_WORKERS = 4
+
+
+def _safe_int(value, default=None):
+    """Safely convert value to integer."""
+    try:
+        return int(value) if value else default
+    except (ValueError, TypeError):
+        return default
+
+
+class RegistrationRepository(BaseRepository):
     """Repository class for handling registration-related database operations."""
     
     def __init__(self, db_connection_func):
         """Initialize with database connection function."""
-        self.get_db_connection = db_connection_func
+        super().__init__(db_connection_func)
+        # (courses data version, published courses JSON, ETag) from the last rebuild
+        self._courses_cache = None
     
-    def validate_registration_data(self, user_data):
-        """Validate registration data before processing."""
+    def validate_registration_data(self, user_data, fast_fail=False):
+        """Validate registration data before processing (stopping at the first error when fast_fail is set)."""
         errors = []
         
         # Required field validation
-        required_fields = ['username', 'email', 'first_name', 'last_name', 'password', 'phone_number']
-        for field in required_fields:
+        for field in REQUIRED_REGISTRATION_FIELDS:
             if not user_data.get(field, '').strip():
                 errors.append(f'{field.replace("_", " ").title()} is required')
+                if fast_fail:
+                    return errors
         
-        # Email validation
-        email = user_data.get('email', '')
-        if email and not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
-            errors.append('Please enter a valid email address')
-        
-        # Username validation
-        username = user_data.get('username', '')
-        if username and len(username) < 3:
-            errors.append('Username must be at least 3 characters long')
-        if username and not re.match(r'^[a-zA-Z0-9_]+$', username):
-            errors.append('Username can only contain letters, numbers, and underscores')
-        
-        # Password validation
-        password = user_data.get('password', '')
-        if password and len(password) < 8:
-            errors.append('Password must be at least 8 characters long')
-        
-        # Phone number validation
-        phone = user_data.get('phone_number', '')
-        if phone and not re.match(r'^[\+]?[0-9\s\-\(\)]{10,15}$', phone):
-            errors.append('Please enter a valid phone number')
-        
-        # ID number validation (if provided)
-        id_number = user_data.get('id_number', '')
-        if id_number and not re.match(r'^[0-9]{7,8}$', id_number):
-            errors.append('National ID number should be 7-8 digits')
+        # Length and format checks for the fields that were provided
+        for field, min_length, pattern, message in REGISTRATION_RULES:
+            value = user_data.get(field, '')
+            if value and ((min_length and len(value) < min_length) or (pattern and not pattern.match(value))):
+                errors.append(message)
+                if fast_fail:
+                    return errors
         
         return errors
     
     def check_existing_user(self, username, email):
         """Check if username or email already exists."""
-        conn = self.get_db_connection()
-        
-        existing = conn.execute(
-            'SELECT username, email FROM users WHERE username = ? OR email = ?',
-            (username, email)
-        ).fetchone()
+        conn = self._conn()
         
-        conn.close()
+        # Two equality probes on the UNIQUE indexes; an OR across both columns can fall back to a scan
+        existing = conn.execute('''
+            SELECT 'username' as taken FROM users WHERE username = ?
+            UNION ALL
+            SELECT 'email' FROM users WHERE email = ?
+            LIMIT 1
+        ''', (username, email)).fetchone()
         
         if existing:
-            if existing['username'] == username:
+            if existing['taken'] == 'username':
                 return 'Username already exists'
-            if existing['email'] == email:
-                return 'Email address already exists'
+            return 'Email address already exists'
         
         return None
     
+    def _user_insert_params(self, user_data, password_hash):
+        """Build the USER_INSERT_SQL parameters for one registrant."""
+        return (
+            user_data['username'], user_data['email'], user_data['full_name'], 
+            password_hash, 'teacher', 1, 'approved',
+            user_data.get('first_name'), user_data.get('last_name'), 
+            user_data.get('date_of_birth'), user_data.get('gender'),
+            user_data.get('phone_number'), user_data.get('address'), 
+            user_data.get('city'), user_data.get('state_province'),
+            user_data.get('postal_code'), user_data.get('country'), 
+            user_data.get('nationality'), user_data.get('id_number'),
+            user_data.get('passport_number'), user_data.get('emergency_contact_name'),
+            user_data.get('emergency_contact_phone'), user_data.get('emergency_contact_relationship'),
+            user_data.get('highest_education'), user_data.get('institution_name'),
+            user_data.get('graduation_year'), user_data.get('professional_experience'),
+            user_data.get('current_position'), user_data.get('organization'),
+            user_data.get('years_of_experience'), user_data.get('department'),
+            user_data.get('preferred_course_id'), user_data.get('motivation'),
+            user_data.get('how_did_you_hear')
+        )
+    
     def create_comprehensive_user(self, user_data):
         """Create a new user with comprehensive university-style data."""
         # Validate data first
@@ -92,125 +191,168 @@ class RegistrationRepository:
         if existing_error:
             return False, existing_error
         
-        conn = self.get_db_connection()
+        conn = self._conn()
         
         try:
-            # Hash password
-            password_hash = hashlib.sha256(user_data['password'].encode()).hexdigest()
+            # Hash password (salted scrypt, same format as the login path verifies)
+            password_hash = hash_password(user_data['password'])
             
-            # Insert comprehensive user data
-            conn.execute('''
-                INSERT INTO users (
-                    username, email, full_name, password_hash, role, is_active, approval_status,
-                    first_name, last_name, date_of_birth, gender, phone_number, address, city,
-                    state_province, postal_code, country, nationality, id_number, passport_number,
-                    emergency_contact_name, emergency_contact_phone, emergency_contact_relationship,
-                    highest_education, institution_name, graduation_year, professional_experience,
-                    current_position, organization, years_of_experience, department,
-                    preferred_course_id, motivation, how_did_you_hear, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (
-                user_data['username'], user_data['email'], user_data['full_name'], 
-                password_hash, 'teacher', 1, 'approved',
-                user_data.get('first_name'), user_data.get('last_name'), 
-                user_data.get('date_of_birth'), user_data.get('gender'),
-                user_data.get('phone_number'), user_data.get('address'), 
-                user_data.get('city'), user_data.get('state_province'),
-                user_data.get('postal_code'), user_data.get('country'), 
-                user_data.get('nationality'), user_data.get('id_number'),
-                user_data.get('passport_number'), user_data.get('emergency_contact_name'),
-                user_data.get('emergency_contact_phone'), user_data.get('emergency_contact_relationship'),
-                user_data.get('highest_education'), user_data.get('institution_name'),
-                user_data.get('graduation_year'), user_data.get('professional_experience'),
-                user_data.get('current_position'), user_data.get('organization'),
-                user_data.get('years_of_experience'), user_data.get('department'),
-                user_data.get('preferred_course_id'), user_data.get('motivation'),
-                user_data.get('how_did_you_hear')
-            ))
+            # Insert the user and the optional enrollment in one write transaction
+            with self._tx(conn):
+                cursor = conn.execute(USER_INSERT_SQL, self._user_insert_params(user_data, password_hash))
+                
+                user_id = cursor.lastrowid
+                
+                # If user selected a preferred course, automatically enroll them (pending approval)
+                if user_data.get('preferred_course_id'):
+                    conn.execute('''
+                        INSERT INTO enrollments (user_id, course_id, approval_status, enrolled_at)
+                        VALUES (?, ?, 'pending', CURRENT_TIMESTAMP)
+                    ''', (user_id, user_data['preferred_course_id']))
             
-            user_id = conn.lastrowid
+            return True, f'Registration successful for "{user_data["full_name"]}". Your account and course enrollment are pending admin approval.'
             
-            # If user selected a preferred course, automatically enroll them (pending approval)
-            if user_data.get('preferred_course_id'):
+        except Exception as e:
+            return False, f'Registration failed: {str(e)}'
+    
+    def validate_batch(self, records):
+        """Validate many registrants, mapping each invalid record's index to its errors."""
+        invalid = {}
+        for index, user_data in enumerate(records):
+            errors = self.validate_registration_data(user_data)
+            if errors:
+                invalid[index] = errors
+        return invalid
+    
+    def bulk_create_users(self, records, batch_size=BULK_IMPORT_BATCH_SIZE):
+        """Validate and import many registrants in one transaction, inserting them in executemany batches."""
+        records = list(records)
+        invalid = self.validate_batch(records)
+        if invalid:
+            details = '; '.join(f'row {index + 1}: {", ".join(errors)}' for index, errors in invalid.items())
+            return False, f'Bulk import rejected: {details}', 0
+        
+        # Hash before taking the write lock; scrypt releases the GIL, so worker threads hash in parallel
+        with ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS) as pool:
+            password_hashes = list(pool.map(hash_password, (user_data['password'] for user_data in records)))
+        
+        conn = self._conn()
+        
+        try:
+            with self._tx(conn):
+                imported = 0
+                usernames = []
+                batch = []
+                for user_data, password_hash in zip(records, password_hashes):
+                    batch.append(self._user_insert_params(user_data, password_hash))
+                    if user_data.get('preferred_course_id'):
+                        usernames.append(user_data['username'])
+                    if len(batch) >= batch_size:
+                        conn.executemany(USER_INSERT_SQL, batch)
+                        imported += len(batch)
+                        batch = []
+                if batch:
+                    conn.executemany(USER_INSERT_SQL, batch)
+                    imported += len(batch)
+                
+                # Pending enrollments for everyone who picked a preferred course
                 conn.execute('''
                     INSERT INTO enrollments (user_id, course_id, approval_status, enrolled_at)
-                    VALUES (?, ?, 'pending', CURRENT_TIMESTAMP)
-                ''', (user_id, user_data['preferred_course_id']))
+                    SELECT id, preferred_course_id, 'pending', CURRENT_TIMESTAMP
+                    FROM users
+                    WHERE username IN (SELECT value FROM json_each(?)) AND preferred_course_id IS NOT NULL
+                ''', (json.dumps(usernames),))
             
-            conn.commit()
-            conn.close()
-            
-            return True, f'Registration successful for "{user_data["full_name"]}". Your account and course enrollment are pending admin approval.'
+            return True, f'Imported {imported} users.', imported
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
-            return False, f'Registration failed: {str(e)}'
+            return False, f'Bulk import failed: {str(e)}', 0
     
-    def get_available_courses(self):
-        """Get all published courses available for registration."""
-        conn = self.get_db_connection()
+    def get_available_courses_json(self):
+        """Get published courses for registration as JSON bytes, their gzipped copy and an ETag."""
+        conn = self._conn()
         
-        courses = conn.execute('''
-            SELECT id, title, description, category, level, duration_hours 
-            FROM courses 
-            WHERE is_published = 1 
-            ORDER BY title
-        ''').fetchall()
+        # The courses triggers bump this counter on every write, so an unchanged counter means an unchanged list
+        version = conn.execute("SELECT version FROM data_versions WHERE name = 'courses'").fetchone()[0]
+        cached = self._courses_cache
+        if cached is None or cached[0] != version:
+            # SQLite serialises the rows itself, so no Row or dict objects are built per course
+            courses_json = conn.execute('''
+                SELECT json_group_array(json_object(
+                    'category', category, 'description', description, 'duration_hours', duration_hours,
+                    'id', id, 'level', level, 'title', title
+                ))
+                FROM (
+                    SELECT id, title, description, category, level, duration_hours 
+                    FROM courses 
+                    WHERE is_published = 1 
+                    ORDER BY title
+                )
+            ''').fetchone()[0]
+            body = courses_json.encode()
+            etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+            cached = self._courses_cache = (version, body, gzip.compress(body, COURSES_GZIP_LEVEL), etag)
+        
+        return cached[1:]
+    
+    def get_user_profile_summary(self, user_id):
+        """Get the profile fields shown on the profile page."""
+        conn = self._conn()
+        
+        user = conn.execute(f'''
+            SELECT {PROFILE_SUMMARY_SELECT}, c.title as preferred_course_title
+            FROM users u
+            LEFT JOIN courses c ON u.preferred_course_id = c.id
+            WHERE u.id = ?
+        ''', (user_id,)).fetchone()
         
-        conn.close()
-        return [dict(course) for course in courses]
+        return user
     
     def get_user_profile(self, user_id):
         """Get comprehensive user profile data."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
-        user = conn.execute('''
-            SELECT u.*, c.title as preferred_course_title
+        user = conn.execute(f'''
+            SELECT {PROFILE_SELECT}, c.title as preferred_course_title
             FROM users u
             LEFT JOIN courses c ON u.preferred_course_id = c.id
             WHERE u.id = ?
         ''', (user_id,)).fetchone()
         
-        conn.close()
-        return dict(user) if user else None
+        return user
     
-    def update_user_profile(self, user_id, profile_data):
-        """Update user profile with new information."""
-        conn = self.get_db_connection()
+    def update_user_profile(self, user_id, profile_data, preferred_course_id=None):
+        """Update user profile with new information, optionally requesting enrollment in a preferred course."""
+        conn = self._conn()
         
         try:
-            conn.execute('''
-                UPDATE users SET
-                    first_name = ?, last_name = ?, full_name = ?, phone_number = ?,
-                    address = ?, city = ?, state_province = ?, postal_code = ?,
-                    country = ?, nationality = ?, emergency_contact_name = ?,
-                    emergency_contact_phone = ?, emergency_contact_relationship = ?,
-                    highest_education = ?, institution_name = ?, graduation_year = ?,
-                    professional_experience = ?, current_position = ?, organization = ?,
-                    years_of_experience = ?, department = ?
-                WHERE id = ?
-            ''', (
-                profile_data.get('first_name'), profile_data.get('last_name'),
-                profile_data.get('full_name'), profile_data.get('phone_number'),
-                profile_data.get('address'), profile_data.get('city'),
-                profile_data.get('state_province'), profile_data.get('postal_code'),
-                profile_data.get('country'), profile_data.get('nationality'),
-                profile_data.get('emergency_contact_name'), profile_data.get('emergency_contact_phone'),
-                profile_data.get('emergency_contact_relationship'), profile_data.get('highest_education'),
-                profile_data.get('institution_name'), profile_data.get('graduation_year'),
-                profile_data.get('professional_experience'), profile_data.get('current_position'),
-                profile_data.get('organization'), profile_data.get('years_of_experience'),
-                profile_data.get('department'), user_id
-            ))
+            # The profile update and the enrollment request commit together
+            with self._tx(conn):
+                conn.execute(PROFILE_UPDATE_SQL, (
+                    profile_data.get('first_name'), profile_data.get('last_name'),
+                    profile_data.get('full_name'), profile_data.get('phone_number'),
+                    profile_data.get('address'), profile_data.get('city'),
+                    profile_data.get('state_province'), profile_data.get('postal_code'),
+                    profile_data.get('country'), profile_data.get('nationality'),
+                    profile_data.get('emergency_contact_name'), profile_data.get('emergency_contact_phone'),
+                    profile_data.get('emergency_contact_relationship'), profile_data.get('highest_education'),
+                    profile_data.get('institution_name'), profile_data.get('graduation_year'),
+                    profile_data.get('professional_experience'), profile_data.get('current_position'),
+                    profile_data.get('organization'), profile_data.get('years_of_experience'),
+                    profile_data.get('department'), user_id
+                ))
+                
+                if preferred_course_id:
+                    conn.execute('''
+                        INSERT INTO enrollments (user_id, course_id, approval_status, enrolled_at)
+                        VALUES (?, ?, 'pending', CURRENT_TIMESTAMP)
+                        ON CONFLICT (user_id, course_id) DO NOTHING
+                    ''', (user_id, preferred_course_id))
             
-            conn.commit()
-            conn.close()
+            invalidate_cached_user(user_id)
             return True, 'Profile updated successfully'
             
         except Exception as e:
-            conn.rollback()
-            conn.close()
             return False, f'Profile update failed: {str(e)}'
 
 
@@ -234,58 +376,20 @@ class RegistrationManager:
                 return redirect(url_for('login'))
 
             if request.method == 'POST':
-                # Build full name from first and last name
-                first_name = request.form.get('first_name', '')
-                last_name = request.form.get('last_name', '')
-                full_name = f"{first_name} {last_name}".strip()
+                profile_data = self._profile_form_data('Kenya')
 
-                profile_data = {
-                    'first_name': first_name,
-                    'last_name': last_name,
-                    'full_name': full_name,
-                    'phone_number': request.form.get('phone_number'),
-                    'address': request.form.get('address'),
-                    'city': request.form.get('city'),
-                    'state_province': request.form.get('state_province'),
-                    'postal_code': request.form.get('postal_code'),
-                    'country': request.form.get('country', 'Kenya'),
-                    'nationality': request.form.get('nationality'),
-                    'emergency_contact_name': request.form.get('emergency_contact_name'),
-                    'emergency_contact_phone': request.form.get('emergency_contact_phone'),
-                    'emergency_contact_relationship': request.form.get('emergency_contact_relationship'),
-                    'highest_education': request.form.get('highest_education'),
-                    'institution_name': request.form.get('institution_name'),
-                    'graduation_year': self._safe_int(request.form.get('graduation_year')),
-                    'professional_experience': request.form.get('professional_experience'),
-                    'current_position': request.form.get('current_position'),
-                    'organization': request.form.get('organization'),
-                    'years_of_experience': self._safe_int(request.form.get('years_of_experience')),
-                    'department': request.form.get('department')
-                }
-
-                success, message = self.registration_repo.update_user_profile(session['user_id'], profile_data)
+                # A preferred course selection becomes a pending enrollment request in the same transaction
+                preferred_course_id = _safe_int(request.form.get('preferred_course_id'))
+                success, message = self.registration_repo.update_user_profile(
+                    session['user_id'], profile_data, preferred_course_id
+                )
 
-                # Handle preferred course selection -> create pending enrollment request
-                preferred_course_id = self._safe_int(request.form.get('preferred_course_id'))
-                if preferred_course_id:
-                    try:
-                        conn = self.registration_repo.get_db_connection()
-                        # Check if enrollment already exists
-                        existing = conn.execute(
-                            'SELECT id FROM enrollments WHERE user_id = ? AND course_id = ?',
-                            (session['user_id'], preferred_course_id)
-                        ).fetchone()
-                        if not existing:
-                            conn.execute('''
-                                INSERT INTO enrollments (user_id, course_id, approval_status, enrolled_at)
-                                VALUES (?, ?, 'pending', CURRENT_TIMESTAMP)
-                            ''', (session['user_id'], preferred_course_id))
-                            conn.commit()
-                        conn.close()
-                    except Exception as e:
-                        flash(f'Could not submit course selection: {str(e)}', 'warning')
-
-                flash('Your registration details have been saved. Await admin approval for course access.', 'success' if success else 'error')
+                if not success:
+                    # Nothing was saved, so send the user back to the form with the reason
+                    flash(message, 'error')
+                    return redirect(url_for('complete_registration'))
+                
+                flash('Your registration details have been saved. Await admin approval for course access.', 'success')
                 return redirect(url_for('dashboard'))
 
             # GET: render form with internal flag and current user data
@@ -295,8 +399,23 @@ class RegistrationManager:
         @self.app.route('/api/courses')
         def api_courses():
             """API endpoint to get available courses for registration."""
-            courses = self.registration_repo.get_available_courses()
-            return jsonify(courses)
+            courses_json, courses_gzip, etag = self.registration_repo.get_available_courses_json()
+            # The compressed body is its own representation, so it gets its own ETag
+            use_gzip = request.accept_encodings['gzip'] > 0
+            if use_gzip:
+                etag += '-gz'
+            
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            elif use_gzip:
+                response = Response(courses_gzip, mimetype='application/json')
+                response.content_encoding = 'gzip'
+            else:
+                response = Response(courses_json, mimetype='application/json')
+            response.set_etag(etag)
+            response.vary.add('Accept-Encoding')
+            response.cache_control.no_cache = True
+            return response
         
         @self.app.route('/profile')
         def profile():
@@ -305,7 +424,7 @@ class RegistrationManager:
                 flash('Please log in to view your profile.', 'error')
                 return redirect(url_for('login'))
             
-            user_profile = self.registration_repo.get_user_profile(session['user_id'])
+            user_profile = self.registration_repo.get_user_profile_summary(session['user_id'])
             if not user_profile:
                 flash('Profile not found.', 'error')
                 return redirect(url_for('dashboard'))
@@ -320,34 +439,7 @@ class RegistrationManager:
                 return redirect(url_for('login'))
             
             if request.method == 'POST':
-                # Build full name from first and last name
-                first_name = request.form.get('first_name', '')
-                last_name = request.form.get('last_name', '')
-                full_name = f"{first_name} {last_name}".strip()
-                
-                profile_data = {
-                    'first_name': first_name,
-                    'last_name': last_name,
-                    'full_name': full_name,
-                    'phone_number': request.form.get('phone_number'),
-                    'address': request.form.get('address'),
-                    'city': request.form.get('city'),
-                    'state_province': request.form.get('state_province'),
-                    'postal_code': request.form.get('postal_code'),
-                    'country': request.form.get('country'),
-                    'nationality': request.form.get('nationality'),
-                    'emergency_contact_name': request.form.get('emergency_contact_name'),
-                    'emergency_contact_phone': request.form.get('emergency_contact_phone'),
-                    'emergency_contact_relationship': request.form.get('emergency_contact_relationship'),
-                    'highest_education': request.form.get('highest_education'),
-                    'institution_name': request.form.get('institution_name'),
-                    'graduation_year': self._safe_int(request.form.get('graduation_year')),
-                    'professional_experience': request.form.get('professional_experience'),
-                    'current_position': request.form.get('current_position'),
-                    'organization': request.form.get('organization'),
-                    'years_of_experience': self._safe_int(request.form.get('years_of_experience')),
-                    'department': request.form.get('department')
-                }
+                profile_data = self._profile_form_data()
                 
                 success, message = self.registration_repo.update_user_profile(session['user_id'], profile_data)
                 flash(message, 'success' if success else 'error')
@@ -362,12 +454,25 @@ class RegistrationManager:
             
             return render_template('edit_profile.html', user=user_profile)
     
-    def _safe_int(self, value, default=None):
-        """Safely convert value to integer."""
-        try:
-            return int(value) if value else default
-        except (ValueError, TypeError):
-            return default
+    def _profile_form_data(self, default_country=None):
+        """Build the profile update dict from the submitted form."""
+        form_get = request.form.get
+        profile_data = {field: form_get(field) for field in PROFILE_FORM_FIELDS}
+        for field in PROFILE_FORM_INT_FIELDS:
+            profile_data[field] = _safe_int(form_get(field))
+        if default_country is not None and profile_data['country'] is None:
+            profile_data['country'] = default_country
+        
+        first_name = form_get('first_name', '')
+        last_name = form_get('last_name', '')
+        profile_data['first_name'] = first_name
+        profile_data['last_name'] = last_name
+        profile_data['full_name'] = self._compose_full_name(first_name, last_name)
+        return profile_data
+    
+    def _compose_full_name(self, first_name, last_name):
+        """Build the stored full name from first and last name."""
+        return ' '.join((first_name, last_name)).strip()
 
 
 def create_registration_manager(app, db_connection_func):
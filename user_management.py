@@ -12,241 +12,327 @@ This module handles all user-related operations including:
 
 import sqlite3
 import hashlib
-from datetime import datetime
+import hmac
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
 from flask import request, session, flash, redirect, url_for, render_template
+from werkzeug.security import generate_password_hash, check_password_hash
+from base_repository import BaseRepository
 
 
-class UserRepository:
+# Statements run on every login and user edit, kept as module constants so each maps
+# to one entry in the connection's prepared-statement cache; they read only the
+# columns login and the edit form use instead of the whole wide users row
+USER_AUTH_SQL = '''
+    SELECT id, username, email, full_name, password_hash, role, is_active, approval_status, last_login
+    FROM users WHERE email = ? AND is_active = 1
+'''
+USER_BY_ID_SQL = '''
+    SELECT id, username, email, full_name, role, department, is_active,
+           approval_status, created_at, last_login
+    FROM users WHERE id = ?
+'''
+UPDATE_LAST_LOGIN_SQL = 'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?'
+
+# Logins within this many seconds of the recorded last_login don't rewrite it
+LAST_LOGIN_UPDATE_INTERVAL = 60
+
+# Columns the admin user list renders, and how many users it shows per page
+USER_LIST_COLUMNS = (
+    'id', 'username', 'email', 'full_name', 'role', 'department',
+    'is_active', 'approval_status', 'created_at'
+)
+USER_LIST_SELECT = ', '.join(f'u.{column}' for column in USER_LIST_COLUMNS)
+USERS_PAGE_SIZE = 50
+
+# Optional profile columns a comprehensive registration may fill in
+PROFILE_INSERT_COLUMNS = (
+    'first_name', 'last_name', 'date_of_birth', 'gender', 'phone_number', 'address', 'city',
+    'state_province', 'postal_code', 'country', 'nationality', 'id_number', 'passport_number',
+    'emergency_contact_name', 'emergency_contact_phone', 'emergency_contact_relationship',
+    'highest_education', 'institution_name', 'graduation_year', 'professional_experience',
+    'current_position', 'organization', 'years_of_experience', 'department',
+    'preferred_course_id', 'motivation', 'how_did_you_hear'
+)
+
+# Users kept by get_user_by_id, most recently used last; writers drop their entries
+USER_CACHE_SIZE = 256
+
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+# Bumped by every invalidation, so a read that raced a write doesn't store the row it saw
+_user_cache_state = {'generation': 0}
+
+# Generated user INSERT statements, one per combination of supplied profile columns
+USER_INSERT_SQL_CACHE_SIZE = 128
+_user_insert_sql_cache = {}
+
+
+def hash_password(password):
+    """Hash a password with a salted key derivation function (scrypt)."""
+    return generate_password_hash(password)
+
+
+def is_legacy_password_hash(password_hash):
+    """Check if a stored hash uses the old unsalted SHA-256 format."""
+    return '$' not in password_hash
+
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash (scrypt or legacy SHA-256)."""
+    if is_legacy_password_hash(password_hash):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), password_hash)
+    return check_password_hash(password_hash, password)
+
+
+def invalidate_cached_user(user_id=None):
+    """Drop one user (or every user when no ID is given) from the get_user_by_id cache."""
+    with _user_cache_lock:
+        _user_cache_state['generation'] += 1
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(int(user_id), None)
+
+
+def _user_insert_sql(columns):
+    """Get the user INSERT statement binding the given profile columns after the account columns."""
+    sql = _user_insert_sql_cache.get(columns)
+    if sql is None:
+        all_columns = ('username', 'email', 'full_name', 'password_hash', 'role', 'is_active', 'approval_status') + columns
+        sql = f"INSERT INTO users ({', '.join(all_columns)}) VALUES ({', '.join('?' * len(all_columns))})"
+        # Form submissions only produce a handful of shapes; the cap keeps crafted ones from growing the cache
+        if len(_user_insert_sql_cache) < USER_INSERT_SQL_CACHE_SIZE:
+            _user_insert_sql_cache[columns] = sql
+    return sql
+
+
+def _is_duplicate_user_error(error):
+    """Check if an IntegrityError came from the UNIQUE username or email constraint."""
+    return str(error).startswith('UNIQUE constraint failed: users.')
+
+
+def require_admin(f):
+    """Decorator for admin pages: flash and redirect to login unless the session belongs to an admin."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Please log in to access this page.', 'error')
+            return redirect(url_for('login'))
+        if session.get('role') != 'admin':
+            flash('Access denied. Admin privileges required.', 'error')
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+class UserRepository(BaseRepository):
     """Repository class for user database operations."""
     
     def __init__(self, db_connection_func):
         """Initialize with database connection function."""
-        self.get_db_connection = db_connection_func
+        super().__init__(db_connection_func)
+        self._stats_cache = None
     
-    def get_all_users(self):
-        """Get all users with enrollment statistics."""
-        conn = self.get_db_connection()
-        users = conn.execute('''
-            SELECT u.*, 
-                   COUNT(e.id) as enrollment_count,
+    def get_all_users(self, before=None, before_id=None, limit=None):
+        """Get users with enrollment statistics, newest first, optionally one keyset page at a time."""
+        conn = self._conn()
+        # Counting per listed user through idx_enrollments_user_status avoids grouping the joined rows,
+        # so the page can be read straight off idx_users_created and stop at the LIMIT
+        users = conn.execute(f'''
+            SELECT {USER_LIST_SELECT}, 
+                   (SELECT COUNT(*) FROM enrollments e
+                    WHERE e.user_id = u.id AND e.approval_status = 'approved') as enrollment_count,
                    u2.full_name as approved_by_name
             FROM users u
-            LEFT JOIN enrollments e ON u.id = e.user_id AND e.approval_status = 'approved'
             LEFT JOIN users u2 ON u.approved_by = u2.id
-            GROUP BY u.id
-            ORDER BY u.created_at DESC
-        ''').fetchall()
-        conn.close()
+            WHERE ?1 IS NULL OR (u.created_at, u.id) < (?1, ?2)
+            ORDER BY u.created_at DESC, u.id DESC
+            LIMIT ?3
+        ''', (before, before_id, -1 if limit is None else limit)).fetchall()
         return users
     
     def get_user_by_id(self, user_id):
-        """Get a single user by ID."""
-        conn = self.get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-        conn.close()
+        """Get a single user by ID (served from the in-process cache until the user changes)."""
+        with _user_cache_lock:
+            user = _user_cache.get(user_id)
+            if user is not None:
+                _user_cache.move_to_end(user_id)
+                return user
+            generation = _user_cache_state['generation']
+        
+        conn = self._conn()
+        user = conn.execute(USER_BY_ID_SQL, (user_id,)).fetchone()
+        if user is not None:
+            with _user_cache_lock:
+                # Skip storing if a write was invalidated while this SELECT ran; the row may predate it
+                if _user_cache_state['generation'] == generation:
+                    _user_cache[user_id] = user
+                    if len(_user_cache) > USER_CACHE_SIZE:
+                        _user_cache.popitem(last=False)
         return user
     
     def get_pending_users(self):
         """Get all users pending approval."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         pending = conn.execute('''
             SELECT * FROM users 
             WHERE approval_status = 'pending'
             ORDER BY created_at ASC
         ''').fetchall()
-        conn.close()
         return pending
     
+    def get_pending_page(self):
+        """Get the pending users and user statistics for the approval page from one read snapshot."""
+        conn = self._conn()
+        # Both reads share the request's connection; the read transaction keeps the counts consistent with the list
+        conn.execute('BEGIN')
+        try:
+            return self.get_pending_users(), self.get_user_statistics()
+        finally:
+            conn.execute('COMMIT')
+    
     def create_user(self, username, email, full_name, password, department='', role='teacher', approval_status='pending'):
         """Create a new user."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
-        # Check if user exists
-        existing_user = conn.execute(
-            'SELECT id FROM users WHERE email = ? OR username = ?',
-            (email, username)
-        ).fetchone()
-        
-        if existing_user:
-            conn.close()
-            return False, 'Email or username already exists.'
-        
-        # Create new user
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        conn.execute('''
-            INSERT INTO users (username, email, full_name, password_hash, department, role, approval_status)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (username, email, full_name, password_hash, department, role, approval_status))
+        # The UNIQUE constraints on username and email reject duplicates, so no existence check is needed first
+        password_hash = hash_password(password)
+        try:
+            conn.execute('''
+                INSERT INTO users (username, email, full_name, password_hash, department, role, approval_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (username, email, full_name, password_hash, department, role, approval_status))
+        except sqlite3.IntegrityError as e:
+            if _is_duplicate_user_error(e):
+                return False, 'Email or username already exists.'
+            raise
         
-        conn.commit()
-        conn.close()
         return True, 'User created successfully.'
     
     def create_comprehensive_user(self, user_data):
         """Create a new user with comprehensive university-style data."""
-        conn = self.get_db_connection()
-        
-        # Check if username or email already exists
-        existing = conn.execute(
-            'SELECT id FROM users WHERE username = ? OR email = ?',
-            (user_data['username'], user_data['email'])
-        ).fetchone()
-        
-        if existing:
-            conn.close()
-            return False, 'Username or email already exists.'
+        conn = self._conn()
         
         # Hash password
-        password_hash = hashlib.sha256(user_data['password'].encode()).hexdigest()
+        password_hash = hash_password(user_data['password'])
         
         try:
-            # Insert comprehensive user data
-            conn.execute('''
-                INSERT INTO users (
-                    username, email, full_name, password_hash, role, is_active, approval_status,
-                    first_name, last_name, date_of_birth, gender, phone_number, address, city,
-                    state_province, postal_code, country, nationality, id_number, passport_number,
-                    emergency_contact_name, emergency_contact_phone, emergency_contact_relationship,
-                    highest_education, institution_name, graduation_year, professional_experience,
-                    current_position, organization, years_of_experience, department,
-                    preferred_course_id, motivation, how_did_you_hear
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user_data['username'], user_data['email'], user_data['full_name'], 
-                password_hash, 'teacher', 1, 'approved',
-                user_data.get('first_name'), user_data.get('last_name'), 
-                user_data.get('date_of_birth'), user_data.get('gender'),
-                user_data.get('phone_number'), user_data.get('address'), 
-                user_data.get('city'), user_data.get('state_province'),
-                user_data.get('postal_code'), user_data.get('country'), 
-                user_data.get('nationality'), user_data.get('id_number'),
-                user_data.get('passport_number'), user_data.get('emergency_contact_name'),
-                user_data.get('emergency_contact_phone'), user_data.get('emergency_contact_relationship'),
-                user_data.get('highest_education'), user_data.get('institution_name'),
-                user_data.get('graduation_year'), user_data.get('professional_experience'),
-                user_data.get('current_position'), user_data.get('organization'),
-                user_data.get('years_of_experience'), user_data.get('department'),
-                user_data.get('preferred_course_id'), user_data.get('motivation'),
-                user_data.get('how_did_you_hear')
-            ))
-            
-            user_id = conn.lastrowid
-            
-            # If user selected a preferred course, automatically enroll them (pending approval)
-            if user_data.get('preferred_course_id'):
-                conn.execute('''
-                    INSERT INTO enrollments (user_id, course_id, approval_status, enrolled_at)
-                    VALUES (?, ?, 'pending', CURRENT_TIMESTAMP)
-                ''', (user_id, user_data['preferred_course_id']))
-            
-            conn.commit()
-            conn.close()
+            # The user and their enrollment request commit together
+            with self._tx(conn):
+                # Only the profile fields actually supplied are bound; the rest keep their column defaults
+                columns = tuple(column for column in PROFILE_INSERT_COLUMNS if user_data.get(column) is not None)
+                cursor = conn.execute(_user_insert_sql(columns), (
+                    user_data['username'], user_data['email'], user_data['full_name'],
+                    password_hash, 'teacher', 1, 'approved',
+                    *(user_data[column] for column in columns)
+                ))
+                
+                user_id = cursor.lastrowid
+                
+                # If user selected a preferred course, automatically enroll them (pending approval)
+                if user_data.get('preferred_course_id'):
+                    conn.execute('''
+                        INSERT INTO enrollments (user_id, course_id, approval_status, enrolled_at)
+                        VALUES (?, ?, 'pending', CURRENT_TIMESTAMP)
+                    ''', (user_id, user_data['preferred_course_id']))
             
             return True, f'Registration successful for "{user_data["full_name"]}". Your account and course enrollment are pending admin approval.'
             
+        except sqlite3.IntegrityError as e:
+            # Duplicates are caught by the UNIQUE constraints rather than a separate lookup
+            if _is_duplicate_user_error(e):
+                return False, 'Username or email already exists.'
+            return False, f'Registration failed: {str(e)}'
         except Exception as e:
-            conn.close()
             return False, f'Registration failed: {str(e)}'
     
     def update_user(self, user_id, username, email, full_name, role, department='', phone='', bio='', is_active=1):
         """Update user information."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
-        # Check if username/email already exists for other users
-        existing = conn.execute('''
-            SELECT id FROM users 
-            WHERE (username = ? OR email = ?) AND id != ?
-        ''', (username, email, user_id)).fetchone()
-        
-        if existing:
-            conn.close()
-            return False, 'Username or email already exists for another user.'
-        
-        # Update user
-        conn.execute('''
-            UPDATE users 
-            SET username = ?, email = ?, full_name = ?, role = ?, 
-                department = ?, phone = ?, bio = ?, is_active = ?
-            WHERE id = ?
-        ''', (username, email, full_name, role, department, phone, bio, is_active, user_id))
+        try:
+            conn.execute('''
+                UPDATE users 
+                SET username = ?, email = ?, full_name = ?, role = ?, 
+                    department = ?, phone = ?, bio = ?, is_active = ?
+                WHERE id = ?
+            ''', (username, email, full_name, role, department, phone, bio, is_active, user_id))
+        except sqlite3.IntegrityError as e:
+            # Duplicates are caught by the UNIQUE constraints rather than a separate lookup
+            if _is_duplicate_user_error(e):
+                return False, 'Username or email already exists for another user.'
+            return False, f'Failed to update user: {str(e)}'
+        invalidate_cached_user(user_id)
         
-        conn.commit()
-        conn.close()
         return True, 'User updated successfully.'
     
     def toggle_user_status(self, user_id):
         """Toggle user active status."""
-        conn = self.get_db_connection()
+        conn = self._conn()
         
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+        # Flip the flag and read back the name in one statement
+        user = conn.execute(
+            'UPDATE users SET is_active = 1 - COALESCE(is_active, 0) WHERE id = ? RETURNING full_name, is_active',
+            (user_id,)
+        ).fetchone()
+        invalidate_cached_user(user_id)
         if not user:
-            conn.close()
             return False, 'User not found.'
         
-        new_status = 0 if user['is_active'] else 1
-        conn.execute('UPDATE users SET is_active = ? WHERE id = ?', (new_status, user_id))
-        conn.commit()
-        conn.close()
-        
-        status_text = 'activated' if new_status else 'deactivated'
+        status_text = 'activated' if user['is_active'] else 'deactivated'
         return True, f'User "{user["full_name"]}" has been {status_text}.'
     
     def deactivate_user(self, user_id):
         """Soft delete user by deactivating."""
-        conn = self.get_db_connection()
+        conn = self._conn()
+        
+        # Soft delete by deactivating the user and their enrollments together
+        with self._tx(conn):
+            user = conn.execute(
+                'UPDATE users SET is_active = 0 WHERE id = ? RETURNING full_name', (user_id,)
+            ).fetchone()
+            if user:
+                conn.execute('UPDATE enrollments SET is_active = 0 WHERE user_id = ?', (user_id,))
         
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+        invalidate_cached_user(user_id)
         if not user:
-            conn.close()
             return False, 'User not found.'
         
-        # Soft delete by deactivating the user
-        conn.execute('UPDATE users SET is_active = 0 WHERE id = ?', (user_id,))
-        
-        # Also deactivate their enrollments
-        conn.execute('UPDATE enrollments SET is_active = 0 WHERE user_id = ?', (user_id,))
-        
-        conn.commit()
-        conn.close()
         return True, f'User "{user["full_name"]}" has been deactivated successfully.'
     
     def approve_user(self, user_id, approved_by):
         """Approve a user registration."""
-        conn = self.get_db_connection()
-        
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-        if not user:
-            conn.close()
-            return False, 'User not found.'
+        conn = self._conn()
         
-        # Approve the user
-        conn.execute('''
+        user = conn.execute('''
             UPDATE users 
             SET approval_status = 'approved', approved_at = CURRENT_TIMESTAMP, approved_by = ?
             WHERE id = ?
-        ''', (approved_by, user_id))
-        conn.commit()
-        conn.close()
+            RETURNING full_name
+        ''', (approved_by, user_id)).fetchone()
+        invalidate_cached_user(user_id)
+        if not user:
+            return False, 'User not found.'
         
         return True, f'User "{user["full_name"]}" approved successfully!'
     
     def reject_user(self, user_id, rejected_by):
         """Reject a user registration."""
-        conn = self.get_db_connection()
-        
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-        if not user:
-            conn.close()
-            return False, 'User not found.'
+        conn = self._conn()
         
-        # Reject the user
-        conn.execute('''
+        user = conn.execute('''
             UPDATE users 
             SET approval_status = 'rejected', approved_at = CURRENT_TIMESTAMP, approved_by = ?
             WHERE id = ?
-        ''', (rejected_by, user_id))
-        conn.commit()
-        conn.close()
+            RETURNING full_name
+        ''', (rejected_by, user_id)).fetchone()
+        invalidate_cached_user(user_id)
+        if not user:
+            return False, 'User not found.'
         
         return True, f'User "{user["full_name"]}" registration rejected.'
     
@@ -255,57 +341,67 @@ class UserRepository:
         if not user_ids:
             return False, 'No users selected.'
         
-        conn = self.get_db_connection()
-        
-        for user_id in user_ids:
-            conn.execute('''
-                UPDATE users 
-                SET approval_status = 'approved', approved_at = CURRENT_TIMESTAMP, approved_by = ?
-                WHERE id = ? AND approval_status = 'pending'
-            ''', (approved_by, user_id))
+        conn = self._conn()
         
-        conn.commit()
-        conn.close()
+        # One UPDATE for the whole selection; the ids travel as a single JSON array parameter
+        cursor = conn.execute('''
+            UPDATE users 
+            SET approval_status = 'approved', approved_at = CURRENT_TIMESTAMP, approved_by = ?
+            WHERE id IN (SELECT value FROM json_each(?)) AND approval_status = 'pending'
+        ''', (approved_by, json.dumps(list(user_ids))))
+        invalidate_cached_user()
         
-        return True, f'Approved {len(user_ids)} user registrations!'
+        return True, f'Approved {cursor.rowcount} user registrations!'
     
     def authenticate_user(self, email, password):
         """Authenticate user login."""
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        
-        conn = self.get_db_connection()
-        user = conn.execute(
-            'SELECT * FROM users WHERE email = ? AND password_hash = ? AND is_active = 1',
-            (email, password_hash)
-        ).fetchone()
-        conn.close()
+        conn = self._conn()
+        user = conn.execute(USER_AUTH_SQL, (email,)).fetchone()
+        
+        if user and not verify_password(user['password_hash'], password):
+            user = None
+        elif user and is_legacy_password_hash(user['password_hash']):
+            # Upgrade legacy unsalted hashes now that the plaintext is known
+            conn.execute(
+                'UPDATE users SET password_hash = ? WHERE id = ?',
+                (hash_password(password), user['id'])
+            )
         
         return user
     
-    def update_last_login(self, user_id):
-        """Update user's last login timestamp."""
-        conn = self.get_db_connection()
-        conn.execute(
-            'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?',
-            (user_id,)
-        )
-        conn.commit()
-        conn.close()
+    def update_last_login(self, user_id, last_login=None):
+        """Update user's last login timestamp, skipping the write if the previous one is still recent."""
+        if last_login:
+            # CURRENT_TIMESTAMP stores naive UTC as 'YYYY-MM-DD HH:MM:SS'
+            elapsed = datetime.now(timezone.utc).replace(tzinfo=None) - datetime.fromisoformat(last_login)
+            if elapsed.total_seconds() < LAST_LOGIN_UPDATE_INTERVAL:
+                return
+        
+        conn = self._conn()
+        conn.execute(UPDATE_LAST_LOGIN_SQL, (user_id,))
+        invalidate_cached_user(user_id)
     
     def get_user_statistics(self):
         """Get user statistics for dashboard."""
-        conn = self.get_db_connection()
-        
-        stats = {
-            'total_users': conn.execute('SELECT COUNT(*) as count FROM users').fetchone()['count'],
-            'active_users': conn.execute('SELECT COUNT(*) as count FROM users WHERE is_active = 1').fetchone()['count'],
-            'pending_users': conn.execute('SELECT COUNT(*) as count FROM users WHERE approval_status = "pending"').fetchone()['count'],
-            'approved_users': conn.execute('SELECT COUNT(*) as count FROM users WHERE approval_status = "approved"').fetchone()['count'],
-            'rejected_users': conn.execute('SELECT COUNT(*) as count FROM users WHERE approval_status = "rejected"').fetchone()['count'],
-        }
-        
-        conn.close()
-        return stats
+        conn = self._conn()
+        
+        # The users triggers bump this counter on every write, so an unchanged counter means unchanged counts
+        version = conn.execute("SELECT version FROM data_versions WHERE name = 'users'").fetchone()[0]
+        cached = self._stats_cache
+        if cached is None or cached[0] != version:
+            # One pass over users instead of five separate COUNT queries
+            stats = dict(conn.execute('''
+                SELECT COUNT(*) as total_users,
+                       COALESCE(SUM(is_active = 1), 0) as active_users,
+                       COALESCE(SUM(approval_status = 'pending'), 0) as pending_users,
+                       COALESCE(SUM(approval_status = 'approved'), 0) as approved_users,
+                       COALESCE(SUM(approval_status = 'rejected'), 0) as rejected_users,
+                       COALESCE(SUM(role = 'admin'), 0) as admin_users
+                FROM users
+            ''').fetchone())
+            cached = self._stats_cache = (version, stats)
+        
+        return dict(cached[1])
 
 
 class UserManager:
@@ -321,20 +417,26 @@ class UserManager:
         """Register all user management routes with the Flask app."""
         
         @self.app.route('/admin/users')
+        @require_admin
         def admin_users():
             """Admin user management - view all users."""
-            if not self._check_admin_access():
-                return redirect(url_for('login'))
+            # Keyset pagination: each page continues after the (created_at, id) of the previous page's last row
+            users = self.user_repo.get_all_users(
+                request.args.get('before'), self._safe_int(request.args.get('before_id')), USERS_PAGE_SIZE + 1
+            )
+            next_page = None
+            if len(users) > USERS_PAGE_SIZE:
+                users = users[:USERS_PAGE_SIZE]
+                next_page = {'before': users[-1]['created_at'], 'before_id': users[-1]['id']}
             
-            users = self.user_repo.get_all_users()
-            return render_template('admin_users.html', users=users)
+            # The summary cards count every user, not just this page
+            user_stats = self.user_repo.get_user_statistics()
+            return render_template('admin_users.html', users=users, next_page=next_page, user_stats=user_stats)
         
         @self.app.route('/admin/users/<int:user_id>/edit', methods=['GET', 'POST'])
+        @require_admin
         def edit_user(user_id):
             """Edit user details."""
-            if not self._check_admin_access():
-                return redirect(url_for('login'))
-            
             if request.method == 'POST':
                 username = request.form['username']
                 email = request.form['email']
@@ -365,11 +467,9 @@ class UserManager:
             return render_template('edit_user.html', user=user)
         
         @self.app.route('/admin/users/<int:user_id>/delete', methods=['POST'])
+        @require_admin
         def delete_user(user_id):
             """Delete a user (soft delete by deactivating)."""
-            if not self._check_admin_access():
-                return redirect(url_for('login'))
-            
             if user_id == session['user_id']:
                 flash('You cannot delete your own account.', 'error')
                 return redirect(url_for('admin_users'))
@@ -379,11 +479,9 @@ class UserManager:
             return redirect(url_for('admin_users'))
         
         @self.app.route('/admin/users/<int:user_id>/toggle-status', methods=['POST'])
+        @require_admin
         def toggle_user_status(user_id):
             """Toggle user active status."""
-            if not self._check_admin_access():
-                return redirect(url_for('login'))
-            
             if user_id == session['user_id']:
                 flash('You cannot modify your own account status.', 'error')
                 return redirect(url_for('admin_users'))
@@ -393,57 +491,43 @@ class UserManager:
             return redirect(url_for('admin_users'))
         
         @self.app.route('/admin/pending-users')
+        @require_admin
         def pending_users():
             """View and manage pending user registrations."""
-            if not self._check_admin_access():
-                return redirect(url_for('login'))
-            
-            pending = self.user_repo.get_pending_users()
-            user_stats = self.user_repo.get_user_statistics()
+            pending, user_stats = self.user_repo.get_pending_page()
             return render_template('pending_users.html', pending=pending, user_stats=user_stats)
         
         @self.app.route('/admin/approve-user/<int:user_id>', methods=['POST'])
+        @require_admin
         def approve_user(user_id):
             """Approve a user registration."""
-            if not self._check_admin_access():
-                return redirect(url_for('login'))
-            
             success, message = self.user_repo.approve_user(user_id, session['user_id'])
             flash(message, 'success' if success else 'error')
             return redirect(url_for('pending_users'))
         
         @self.app.route('/admin/reject-user/<int:user_id>', methods=['POST'])
+        @require_admin
         def reject_user(user_id):
             """Reject a user registration."""
-            if not self._check_admin_access():
-                return redirect(url_for('login'))
-            
             success, message = self.user_repo.reject_user(user_id, session['user_id'])
             flash(message, 'warning' if success else 'error')
             return redirect(url_for('pending_users'))
         
         @self.app.route('/admin/bulk-approve-users', methods=['POST'])
+        @require_admin
         def bulk_approve_users():
             """Approve multiple user registrations."""
-            if not self._check_admin_access():
-                return redirect(url_for('login'))
-            
             user_ids = request.form.getlist('user_ids')
             success, message = self.user_repo.bulk_approve_users(user_ids, session['user_id'])
             flash(message, 'success' if success else 'warning')
             return redirect(url_for('pending_users'))
     
-    def _check_admin_access(self):
-        """Check if current user has admin access."""
-        if 'user_id' not in session:
-            flash('Please log in to access this page.', 'error')
-            return False
-        
-        if session.get('role') != 'admin':
-            flash('Access denied. Admin privileges required.', 'error')
-            return False
-        
-        return True
+    def _safe_int(self, value, default=None):
+        """Safely convert value to integer."""
+        try:
+            return int(value) if value else default
+        except (ValueError, TypeError):
+            return default
     
     def register_user(self, username, email, full_name, password, department=''):
         """Register a new user (public registration) - approved for login but restricted course access."""
@@ -464,7 +548,7 @@ class UserManager:
         
         # All users can login, but access to course content is controlled separately
         # Update last login
-        self.user_repo.update_last_login(user['id'])
+        self.user_repo.update_last_login(user['id'], user['last_login'])
         
         # Admin users are automatically approved and don't need approval checks
         if user['role'] == 'admin':